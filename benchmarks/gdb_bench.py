@@ -0,0 +1,158 @@
+"""
+Benchmark worker, runs inside `gdb -batch` (started by `run_benchmarks.py`).
+Configured through the environment:
+    BENCH_TARGET        binary to load
+    BENCH_OUTPUT        where the JSON results are written
+    BENCH_STOP_SECONDS  length of the stops/sec window, 0 skips it
+    BENCH_JOBS          worker processes of the parallel scan, 1 skips it
+    BENCH_TRIGGER       trigger script for `track_flow narrow` (both strategies), empty skips it
+"""
+import json
+import os
+import sys
+import time
+import gdb
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gdb_scripts"))
+
+from functions_finder import FunctionFinder
+
+
+def bench_scan() -> tuple[list[int], dict]:
+    """A cold scan (no cache), then a cache write and a cache hit."""
+    finder = FunctionFinder(use_cache=False)
+    started = time.perf_counter()
+    addresses = finder.get_functions_addresses()
+    cold_seconds = time.perf_counter() - started
+
+    FunctionFinder().get_functions_addresses()
+    started = time.perf_counter()
+    FunctionFinder().get_functions_addresses()
+    cached_seconds = time.perf_counter() - started
+
+    stats = finder.scan_stats
+    return addresses, {
+        "functions": len(addresses),
+        "bytes": stats.bytes_scanned,
+        "scan_seconds": stats.seconds,
+        "mb_per_sec": stats.mb_per_sec,
+        "candidates": stats.candidates,
+        "confirmed": stats.confirmed,
+        "cold_seconds": cold_seconds,
+        "cached_seconds": cached_seconds,
+    }
+
+
+def bench_parallel_scan(addresses: list[int], serial: dict, jobs: int) -> dict:
+    """The cold scan again over `jobs` forked workers, against the serial one."""
+    finder = FunctionFinder(use_cache=False, jobs=jobs)
+    started = time.perf_counter()
+    parallel_addresses = finder.get_functions_addresses()
+    cold_seconds = time.perf_counter() - started
+
+    stats = finder.scan_stats
+    return {
+        "jobs": jobs,
+        "scan_seconds": stats.seconds,
+        "mb_per_sec": stats.mb_per_sec,
+        "cold_seconds": cold_seconds,
+        "speedup": serial["scan_seconds"] / stats.seconds if stats.seconds else 0.0,
+        # the workers must find exactly what the serial scan found
+        "same_functions": set(parallel_addresses) == set(addresses),
+    }
+
+
+def bench_arm(break_on_functions, addresses: list[int]) -> dict:
+    """Arming from scratch, disarming, re-arming the kept breakpoints and deleting them."""
+    break_on_functions.set_break_addresses(addresses)
+    results = {"breakpoints": len(addresses)}
+
+    break_on_functions.break_functions()
+    results["create_seconds"] = break_on_functions.arm_stats["arm_seconds"]
+    break_on_functions.disarm_functions()
+    results["disarm_seconds"] = break_on_functions.arm_stats["disarm_seconds"]
+    break_on_functions.break_functions()
+    results["rearm_seconds"] = break_on_functions.arm_stats["arm_seconds"]
+    break_on_functions.disarm_functions()
+
+    started = time.perf_counter()
+    break_on_functions.delete_breakpoints()
+    results["delete_seconds"] = time.perf_counter() - started
+    return results
+
+
+def bench_stops(break_on_functions, addresses: list[int], seconds: float) -> dict:
+    """Every function armed for `seconds`, the target's loop keeps hitting the hot ones."""
+    break_on_functions.on_stop_function = break_on_functions.on_stop
+    break_on_functions.set_break_addresses(addresses)
+    break_on_functions.stats.reset()
+    break_on_functions.start(seconds)
+
+    stops = sum(info.count for info in break_on_functions.get_break_info().values())
+    run_seconds = break_on_functions.get_round_breakdown().get("run", seconds)
+    break_on_functions.delete_breakpoints()
+    return {
+        "stops": stops,
+        "seconds": run_seconds,
+        "stops_per_sec": stops / run_seconds if run_seconds else 0.0,
+        # where the time of each stop went, see `break_on_functions stats`
+        "hot_path": break_on_functions.stats.to_dict(),
+    }
+
+
+def bench_narrow(track_flow, addresses: list[int], trigger_path: str, strategy: str) -> dict:
+    """One `track_flow narrow` from every function, with the armed/hit/candidates sizes of each round."""
+    # the trigger signals the target, it runs in a thread that can't ask gdb for the pid
+    os.environ["BENCH_PID"] = str(gdb.selected_inferior().pid)
+    track_flow.break_on_functions.set_break_addresses(addresses)
+
+    narrow = track_flow.narrow_down_bisect if strategy == "bisect" else track_flow.narrow_down
+    started = time.perf_counter()
+    rounds = narrow(trigger_path)
+    seconds = time.perf_counter() - started
+    track_flow.break_on_functions.delete_breakpoints()
+    return {
+        "rounds": len(rounds),
+        "seconds": seconds,
+        "functions": len(track_flow.break_on_functions.proc_functions_address),
+        "round_sizes": [list(sizes) for sizes in rounds],
+    }
+
+
+def main():
+    target = os.environ["BENCH_TARGET"]
+    stop_seconds = float(os.environ.get("BENCH_STOP_SECONDS", "0"))
+    jobs = int(os.environ.get("BENCH_JOBS", "1"))
+    trigger_path = os.environ.get("BENCH_TRIGGER", "")
+
+    gdb.execute("set pagination off")
+    gdb.execute("set confirm off")
+    # the synthetic targets are triggered with SIGUSR1, it must reach them without a stop
+    gdb.execute("handle SIGUSR1 nostop noprint pass")
+    gdb.execute(f"file {target}")
+    gdb.execute("tbreak main")
+    gdb.execute("run")
+
+    results = {"target": os.path.basename(target)}
+    addresses, results["scan"] = bench_scan()
+    if jobs > 1:
+        results["scan_parallel"] = bench_parallel_scan(addresses, results["scan"], jobs)
+
+    # imported once the process runs, they discover the functions when they load (from the cache by now)
+    import track_flow
+    flow = track_flow.track_flow_command
+    flow.break_on_functions.debug = False
+
+    results["arm"] = bench_arm(flow.break_on_functions, addresses)
+    if stop_seconds:
+        results["stops"] = bench_stops(flow.break_on_functions, addresses, stop_seconds)
+    if trigger_path:
+        for strategy in track_flow.NARROW_STRATEGIES:
+            results[f"narrow_{strategy}"] = bench_narrow(flow, addresses, trigger_path, strategy)
+
+    with open(os.environ["BENCH_OUTPUT"], "w") as f:
+        json.dump(results, f, indent=2)
+    gdb.execute("kill")
+
+
+main()
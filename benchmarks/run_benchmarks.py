@@ -0,0 +1,197 @@
+"""
+Benchmarks for the hot paths of the gdb scripts: function scanning, breakpoint arming, stops per
+second and `track_flow narrow`. Every target is built, then measured by `gdb_bench.py` in a
+headless gdb, and the results are written as JSON.
+Usage: python run_benchmarks.py [--output results.json] [--compare previous.json] [--functions N] [--jobs N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+CFLAGS: list[str] = ["-O0", "-fno-omit-frame-pointer", "-fno-inline"]
+# functions the synthetic target calls on every loop iteration / only when triggered
+SYNTHETIC_HOT_FUNCTIONS: int = 16
+SYNTHETIC_TRIGGER_FUNCTIONS: int = 64
+
+# sources shipped with the repo: (name, source, extra compiler flags)
+REPO_TARGETS: list[tuple[str, str, list[str]]] = [
+    ("gdb_test", "gdb_test.c", []),
+    ("main_linux", "main_linux.c", ["-pthread"]),
+]
+
+TRIGGER_SCRIPT: str = """\
+import os
+import signal
+import time
+
+os.kill(int(os.environ["BENCH_PID"]), signal.SIGUSR1)
+# let the target run the triggered functions while the breakpoints are armed
+time.sleep(0.2)
+"""
+
+# metric name suffix -> True when higher is better
+METRIC_DIRECTIONS: dict[str, bool] = {
+    "mb_per_sec": True,
+    "stops_per_sec": True,
+    "seconds": False,
+}
+
+
+def generate_synthetic_source(functions: int) -> str:
+    """
+    `functions` small functions, a loop calling the hot ones and the trigger ones only after a
+    SIGUSR1, so `narrow` has a known answer (hot + trigger functions).
+    """
+    lines = [
+        "#include <signal.h>",
+        "#include <unistd.h>",
+        "",
+        "volatile sig_atomic_t triggered;",
+        "volatile unsigned long sink;",
+        "",
+    ]
+    lines += [f"__attribute__((noinline)) void fn_{i}(void) {{ sink += {i}; }}" for i in range(functions)]
+    lines += [
+        "",
+        "static void on_trigger(int sig) { triggered = 1; }",
+        "",
+        "int main(void) {",
+        "    signal(SIGUSR1, on_trigger);",
+        "    for (;;) {",
+    ]
+    lines += [f"        fn_{i}();" for i in range(min(SYNTHETIC_HOT_FUNCTIONS, functions))]
+    lines.append("        if (triggered) {")
+    lines.append("            triggered = 0;")
+    trigger_end = min(SYNTHETIC_HOT_FUNCTIONS + SYNTHETIC_TRIGGER_FUNCTIONS, functions)
+    lines += [f"            fn_{i}();" for i in range(SYNTHETIC_HOT_FUNCTIONS, trigger_end)]
+    lines += [
+        "        }",
+        "        usleep(100);",
+        "    }",
+        "}",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def compile_target(source: str, output: str, flags: list[str]) -> None:
+    subprocess.run(["gcc", *CFLAGS, *flags, "-o", output, source], check=True)
+
+
+def run_gdb(gdb_path: str, target: str, output: str, env: dict, timeout: float) -> dict:
+    env = {**os.environ, **env, "BENCH_TARGET": target, "BENCH_OUTPUT": output}
+    command = [gdb_path, "-nx", "-batch", "-x", os.path.join(BENCH_DIR, "gdb_bench.py")]
+    process = subprocess.run(command, env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                             timeout=timeout)
+    if not os.path.isfile(output):
+        raise RuntimeError(f"gdb produced no results for {target}:\n{process.stdout[-2000:]}{process.stderr[-2000:]}")
+    with open(output) as f:
+        return json.load(f)
+
+
+def tool_version(command: list[str]) -> str:
+    try:
+        return subprocess.run(command, capture_output=True, text=True, cwd=REPO_DIR).stdout.splitlines()[0].strip()
+    except (OSError, IndexError):
+        return "unknown"
+
+
+def flatten(results: dict) -> dict[str, float]:
+    """`target.section.metric` -> value, for the comparable (timing and rate) metrics."""
+    metrics = {}
+    for target in results["targets"]:
+        for section, values in target.items():
+            if not isinstance(values, dict):
+                continue
+            for metric, value in values.items():
+                if any(metric.endswith(suffix) for suffix in METRIC_DIRECTIONS):
+                    metrics[f"{target['target']}.{section}.{metric}"] = value
+    return metrics
+
+
+def compare(current: dict, previous: dict, tolerance: float) -> list[str]:
+    """Print the change of every metric, returns the ones that regressed by more than `tolerance`."""
+    regressions = []
+    before = flatten(previous)
+    print(f"[*] Compared to {previous.get('revision', 'unknown')}:", file=sys.stderr)
+    for name, value in flatten(current).items():
+        old = before.get(name)
+        if not old:
+            continue
+        higher_is_better = next(direction for suffix, direction in METRIC_DIRECTIONS.items() if name.endswith(suffix))
+        change = (value - old) / old
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        marker = "[!]" if regressed else "   "
+        print(f"{marker} {name:45} {old:12.4f} -> {value:12.4f} ({change:+.1%})", file=sys.stderr)
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gdb", default="gdb", help="gdb binary, its python needs capstone")
+    parser.add_argument("--functions", type=int, default=2000, help="functions in the synthetic target")
+    parser.add_argument("--jobs", type=int, default=4,
+                        help="worker processes of the parallel scan measured against the serial one, 1 skips it")
+    parser.add_argument("--stop-seconds", type=float, default=5.0, help="length of the stops/sec window")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds allowed per target")
+    parser.add_argument("--output", help="results file (default: stdout)")
+    parser.add_argument("--compare", help="previous results, exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="gdb-inspector-bench-") as work_dir:
+        targets = []
+        for name, source, flags in REPO_TARGETS:
+            targets.append((name, os.path.join(REPO_DIR, source), flags, {}))
+
+        synthetic_source = os.path.join(work_dir, f"synthetic_{args.functions}.c")
+        with open(synthetic_source, "w") as f:
+            f.write(generate_synthetic_source(args.functions))
+        trigger_path = os.path.join(work_dir, "trigger.py")
+        with open(trigger_path, "w") as f:
+            f.write(TRIGGER_SCRIPT)
+        targets.append((f"synthetic_{args.functions}", synthetic_source, [],
+                        {"BENCH_STOP_SECONDS": str(args.stop_seconds), "BENCH_TRIGGER": trigger_path}))
+
+        results = []
+        for name, source, flags, env in targets:
+            print(f"[*] Benchmarking {name}", file=sys.stderr)
+            binary = os.path.join(work_dir, name)
+            compile_target(source, binary, flags)
+            # a private cache, so the cold and cached runs measure this build only
+            env = {**env, "GDB_INSPECTOR_CACHE": os.path.join(work_dir, "cache"), "BENCH_JOBS": str(args.jobs)}
+            results.append(run_gdb(args.gdb, binary, os.path.join(work_dir, f"{name}.json"), env, args.timeout))
+
+    report = {
+        "revision": tool_version(["git", "rev-parse", "--short", "HEAD"]),
+        "gdb": tool_version([args.gdb, "--version"]),
+        "python": sys.version.split()[0],
+        "targets": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[+] Wrote {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"[!] {len(regressions)} metrics regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
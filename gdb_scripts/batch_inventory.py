@@ -0,0 +1,133 @@
+"""
+Inventory the functions of many binaries at once, runs without gdb.
+Every binary is processed by `batch_worker.py` in its own `gdb -batch`, as many at a time as there
+are cores, and the results are merged into one JSON document. Identical binaries (same build-id
+or content) are only processed once, and the workers share the address cache.
+Usage: python batch_inventory.py <binary|@list_file>... [--jobs N] [--output inventory.json]
+                                 [--trigger script.py] [--args ARGS] [--no-cache] [--cache-dir DIR]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add the directory containing this script to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from function_cache import binary_key
+
+WORKER_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_worker.py")
+DEFAULT_WORKER_TIMEOUT: float = 600.0
+
+
+def expand_binaries(arguments: list[str]) -> list[str]:
+    """Paths as given, `@file` arguments are files with one path per line."""
+    binaries = []
+    for argument in arguments:
+        if argument.startswith("@"):
+            with open(argument[1:]) as f:
+                binaries.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+        else:
+            binaries.append(argument)
+    return [os.path.abspath(binary) for binary in binaries]
+
+
+def run_worker(binary: str, output: str, args: argparse.Namespace) -> dict:
+    env = {**os.environ, "BATCH_BINARY": binary, "BATCH_OUTPUT": output}
+    if args.trigger:
+        env["BATCH_TRIGGER"] = os.path.abspath(args.trigger)
+    if args.args:
+        env["BATCH_ARGS"] = args.args
+    if args.no_cache:
+        env["BATCH_NO_CACHE"] = "1"
+    if args.cache_dir:
+        env["GDB_INSPECTOR_CACHE"] = args.cache_dir
+
+    command = [args.gdb, "-nx", "-batch", "-x", WORKER_PATH]
+    try:
+        process = subprocess.run(command, env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                                 timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        return {"binary": binary, "error": f"timed out after {args.timeout}s"}
+    except OSError as e:
+        return {"binary": binary, "error": f"can't run gdb: {e}"}
+
+    if not os.path.isfile(output):
+        return {"binary": binary, "error": f"gdb exited with {process.returncode}: {process.stderr[-1000:].strip()}"}
+    with open(output) as f:
+        return json.load(f)
+
+
+def summarize(results: list[dict], seconds: float) -> dict:
+    succeeded = [result for result in results if "error" not in result]
+    return {
+        "binaries": len(results),
+        "failed": len(results) - len(succeeded),
+        "functions": sum(len(result["discovery"]["functions"]) for result in succeeded if "discovery" in result),
+        "cache_hits": sum(1 for result in succeeded if result.get("discovery", {}).get("cache_hit")),
+        "seconds": seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("binaries", nargs="+", help="binaries, or @file listing one per line")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="gdb processes at a time")
+    parser.add_argument("--gdb", default="gdb", help="gdb binary, its python needs capstone")
+    parser.add_argument("--output", help="merged results (default: stdout)")
+    parser.add_argument("--trigger", help="also run `track_flow narrow` with this trigger on every binary")
+    parser.add_argument("--args", help="arguments passed to every binary")
+    parser.add_argument("--no-cache", action="store_true", help="always rescan, skip the address cache")
+    parser.add_argument("--cache-dir", help="address cache shared by the workers")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_WORKER_TIMEOUT, help="seconds allowed per binary")
+    args = parser.parse_args()
+
+    if args.trigger and args.jobs > 1:
+        print("[#] Triggers run concurrently, make sure the targets don't share ports or files.", file=sys.stderr)
+
+    binaries = expand_binaries(args.binaries)
+    # identical binaries are processed once, the copies reuse the results
+    by_key: dict[str, list[str]] = {}
+    for binary in binaries:
+        try:
+            key = binary_key(binary, "")
+        except OSError as e:
+            print(f"[!] Can't read {binary}: {e}", file=sys.stderr)
+            key = binary
+        by_key.setdefault(key, []).append(binary)
+
+    started = time.perf_counter()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="gdb-inspector-batch-") as work_dir, \
+            ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        futures = {
+            pool.submit(run_worker, paths[0], os.path.join(work_dir, f"{index}.json"), args): paths
+            for index, paths in enumerate(by_key.values())
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            paths = futures[future]
+            result = future.result()
+            status = f"[!] {result['error']}" if "error" in result else "[+]"
+            print(f"[*] {done}/{len(futures)} {paths[0]} {status}", file=sys.stderr)
+            results.append(result)
+            for copy in paths[1:]:
+                results.append({**result, "binary": copy, "duplicate_of": paths[0]})
+
+    results.sort(key=lambda result: result["binary"])
+    inventory = {"summary": summarize(results, time.perf_counter() - started), "binaries": results}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(inventory, f, indent=2)
+        print(f"[+] Wrote {args.output}: {inventory['summary']}", file=sys.stderr)
+    else:
+        json.dump(inventory, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Worker of `batch_inventory.py`, runs inside `gdb -batch` on one binary and writes its results as JSON.
+Configured through the environment:
+    BATCH_BINARY    binary to load
+    BATCH_OUTPUT    where the JSON results are written
+    BATCH_ARGS      arguments of the binary (optional)
+    BATCH_TRIGGER   trigger script, runs `track_flow narrow` after the discovery (optional)
+    BATCH_NO_CACHE  set to skip the address cache
+"""
+import json
+import os
+import sys
+import time
+import traceback
+import gdb
+
+# Add the directory containing this script to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from function_cache import read_build_id
+from functions_finder import FunctionFinder
+from symbolizer import Symbolizer
+
+
+def discover(use_cache: bool) -> tuple[set[int], dict]:
+    finder = FunctionFinder(use_cache=use_cache)
+    started = time.perf_counter()
+    addresses = finder.get_functions_addresses()
+    seconds = time.perf_counter() - started
+
+    mappings = finder.get_proc_mappings()
+    load_base = finder.get_load_base(mappings) if mappings else 0
+    symbolizer = Symbolizer.from_finder(finder, addresses)
+    return addresses, {
+        "arch": finder.proc_arch,
+        "load_base": load_base,
+        "seconds": seconds,
+        # nothing was scanned when the addresses came from the cache
+        "cache_hit": bool(addresses) and finder.scan_stats.bytes_scanned == 0,
+        "scanned_bytes": finder.scan_stats.bytes_scanned,
+        # offsets from the load base, comparable across runs and machines
+        "functions": [
+            {"offset": addr - load_base, "name": symbolizer.name(addr)} for addr in sorted(addresses)
+        ],
+    }
+
+
+def run_flow(trigger_path: str) -> dict:
+    # imported once the process runs, they discover the functions when they load (from the cache by now)
+    import track_flow
+    flow = track_flow.track_flow_command
+    flow.break_on_functions.debug = False
+
+    started = time.perf_counter()
+    rounds = flow.narrow_down(trigger_path)
+    break_info = flow.break_on_functions.symbolize(flow.break_on_functions.get_break_info())
+    flow.break_on_functions.delete_breakpoints()
+    return {
+        "trigger": trigger_path,
+        "rounds": [{"armed": armed, "hit": hit} for armed, hit in rounds],
+        "seconds": time.perf_counter() - started,
+        "functions": [
+            {"address": info.address, "name": info.name, "count": info.count}
+            for info in sorted(break_info.values(), key=lambda info: info.address)
+        ],
+    }
+
+
+def main():
+    binary = os.environ["BATCH_BINARY"]
+    trigger_path = os.environ.get("BATCH_TRIGGER", "")
+    build_id = read_build_id(binary)
+    results = {"binary": binary, "build_id": build_id.hex() if build_id else None}
+
+    try:
+        gdb.execute("set pagination off")
+        gdb.execute("set confirm off")
+        gdb.execute(f"file {binary}")
+        if run_args := os.environ.get("BATCH_ARGS"):
+            gdb.execute(f"set args {run_args}")
+
+        if trigger_path:
+            # the trigger talks to the running service, let it initialize first
+            gdb.execute("tbreak main")
+            gdb.execute("run")
+        else:
+            # discovery only needs the binary mapped, none of its code runs
+            gdb.execute("starti")
+
+        _, results["discovery"] = discover(use_cache="BATCH_NO_CACHE" not in os.environ)
+        if trigger_path:
+            results["flow"] = run_flow(trigger_path)
+    except Exception as e:
+        results["error"] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+
+    with open(os.environ["BATCH_OUTPUT"], "w") as f:
+        json.dump(results, f)
+
+    try:
+        gdb.execute("kill")
+    except gdb.error:
+        pass
+
+
+main()
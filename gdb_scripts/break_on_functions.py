@@ -1,34 +1,69 @@
-from dataclasses import dataclass
+from fnmatch import fnmatch
 import sys
 import os
 import threading
 import time
+from typing import Optional
 import gdb
 
 # Add the directory containing this script to sys.path
 sys.path.append(os.path.dirname(__file__))
 
-from functions_finder import FunctionFinder
+from call_graph import CallGraph
+from command_options import positive_int
+from functions_finder import FunctionFinder, parse_finder_options
+from hot_path_stats import HotPathStats, read_process_cpu_ns
+from proc_maps import mapping_table
+from symbolizer import Symbolizer
+from trace_log import DEFAULT_TRACE_CAPACITY, EVENT_ENTRY, TraceLogWriter
+
+# seconds between two samples of the armed breakpoints count in coverage mode
+COVERAGE_SAMPLE_INTERVAL: float = 1.0
 
-@dataclass
 class TraceCallInfo:
-    name: str
-    address: str
-    count: int = 1
+    __slots__ = ("name", "address", "count")
+
+    # `name` stays None until a report symbolizes it
+    def __init__(self, name: Optional[str], address: int, count: int = 1):
+        self.name = name
+        self.address = address
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f"TraceCallInfo(name={self.name!r}, address=0x{self.address:x}, count={self.count})"
 
 class BreakInfo(dict):
+    """Hit table keyed by the integer pc of each function, iterating it yields the addresses."""
+
     def __contains__(self, key):
-        """Check if a BreakInfo or address string is in the dict by address."""
+        """Check if a TraceCallInfo or an address is in the dict."""
         if isinstance(key, TraceCallInfo):
-            key_address = key.address
-        else:
-            key_address = key
-        return any(val.address == key_address for val in self.values())
+            key = key.address
+        return dict.__contains__(self, key)
+
+    def record(self, address: int, name: Optional[str] = None) -> bool:
+        """Count a hit at `address`, returns True if this is the first one."""
+        info = self.get(address)
+        if info is None:
+            self[address] = TraceCallInfo(name=name, address=address)
+            return True
+        info.count += 1
+        return False
+
+    def merge(self, other: "BreakInfo") -> "BreakInfo":
+        """Add the hits of `other` into this table, returns self."""
+        for address, info in other.items():
+            existing = self.get(address)
+            if existing is None:
+                self[address] = TraceCallInfo(name=info.name, address=address, count=info.count)
+            else:
+                existing.count += info.count
+        return self
 
     def __eq__(self, other):
         if not isinstance(other, BreakInfo):
             return NotImplemented
-        return self._address_set() == other._address_set()
+        return self.keys() == other.keys()
 
     def __ne__(self, other):
         eq = self.__eq__(other)
@@ -36,62 +71,235 @@ class BreakInfo(dict):
             return NotImplemented
         return not eq
 
-    def __iter__(self):
-        """Make list(self) return a list of addresses."""
-        print("here")
-        for val in self.values():
-            yield int(val.address, 16)
-
-
     def _address_set(self):
-        return {int(val.address, 16) for val in self.values()}
+        return self.keys()
 
 class BreakOnFunctions(gdb.Command):
     """Set breakpoints on all detected function entry points."""
 
     def __init__(self):
         self.running = False
+        self.symbolizer: Symbolizer = None
+        # discovered functions per loaded object (the main binary and the traced libraries)
+        self.objfile_functions: dict[str, set[int]] = {}
+        # shared objects matching this glob are discovered as they load (None to only trace the binary)
+        self.library_pattern: Optional[str] = None
         self.proc_functions_address = self._get_initial_functions()
-        self.break_info = BreakInfo()
+        # hit tables sharded by gdb thread number, merged on demand for the whole process view
+        self.thread_break_info: dict[int, BreakInfo] = {}
+        # only break in these gdb threads (None for all of them)
+        self.thread_filter: list[int] = None
+        self._armed_thread_filter: list[int] = None
         self.lock = threading.Lock()
-        self.can_run_script = False
+        # round coordination between the gdb thread, the trigger thread and the round watcher
+        self.armed = threading.Event()  # breakpoints are set, the trigger may run
+        self.trigger_done = threading.Event()  # the trigger finished (or a stop was requested)
+        self.stopped = threading.Event()  # the round is torn down, a new one may start
+        # bumped by every `start`, a trigger only ends the round it was started for
+        self.round_id = 0
+        self.stopped.set()
+        self.round_timings = {}
+        # per-phase latency histograms and counters, see `break_on_functions stats`
+        self.stats = HotPathStats()
+        self._resumed_at = 0
+        self._nested_ns = 0
+        self._round_cpu_ns = None
+        # optional binary log of every stop, see `trace_analyzer.py`
+        self.trace_log = None
         self.debug = True
         self.on_stop_function = self.on_stop
+        self.coverage = False
+        self.armed_timeline = []
+        self.start_time = 0.0
+        # every breakpoint this tool created, reused (toggled) across iterations
+        self.owned_breakpoints: dict[int, gdb.Breakpoint] = {}
+        self.arm_stats = {"arm_seconds": 0.0, "disarm_seconds": 0.0, "created": 0, "reused": 0, "deleted": 0}
+        gdb.events.new_objfile.connect(self.on_new_objfile)
+        # gdb 13+
+        if hasattr(gdb.events, "free_objfile"):
+            gdb.events.free_objfile.connect(self.on_free_objfile)
         super().__init__("break_on_functions", gdb.COMMAND_USER)
 
-    def _get_initial_functions(self):
+    def _get_initial_functions(self, **finder_options):
         """
         When running the first time we want to get all the functions from the binary
         """
-        finder = FunctionFinder()
-        return finder.get_functions_addresses()
+        finder = FunctionFinder(**finder_options)
+        addresses = finder.get_functions_addresses()
+        self.objfile_functions[finder.proc_name] = addresses
+        # names are looked up in this index at report time, never on a stop
+        if self.symbolizer is None:
+            self.symbolizer = Symbolizer.from_finder(finder, addresses)
+        else:
+            self.symbolizer.add_finder(finder, addresses)
+        return [addr for functions in self.objfile_functions.values() for addr in functions]
+
+    def discover_objfile(self, path: str) -> set[int]:
+        """Discover one shared object on its own, through its own address cache entry."""
+        finder = FunctionFinder(objfile=path)
+        addresses = finder.get_functions_addresses()
+        self.objfile_functions[path] = addresses
+        self.symbolizer.add_finder(finder, addresses)
+        return addresses
+
+    def _wants_objfile(self, objfile: gdb.Objfile) -> bool:
+        if self.library_pattern is None or not objfile.is_valid() or objfile.owner is not None:
+            # not tracing libraries, or a separate debug info file
+            return False
+        path = objfile.filename
+        if not path or path == gdb.current_progspace().filename or path in self.objfile_functions:
+            return False
+        # the vdso has no file
+        if not os.path.isfile(path):
+            return False
+        return fnmatch(path, self.library_pattern) or fnmatch(os.path.basename(path), self.library_pattern)
+
+    def on_new_objfile(self, event) -> None:
+        """A library was loaded (at startup or by dlopen), discover and arm only its functions."""
+        objfile = event.new_objfile
+        if not self._wants_objfile(objfile):
+            return
+
+        try:
+            addresses = self.discover_objfile(objfile.filename)
+        except Exception as e:
+            print(f"[!] Could not discover {objfile.filename}: {e}")
+            return
+        print(f"[+] Discovered {len(addresses)} functions in {objfile.filename}.")
+
+        self.proc_functions_address = [*self.proc_functions_address, *addresses]
+        if self.running:
+            self._arm_addresses(addresses)
+
+    def on_free_objfile(self, event) -> None:
+        addresses = self.objfile_functions.pop(event.objfile.filename, None)
+        if not addresses:
+            return
+
+        self.proc_functions_address = [addr for addr in self.proc_functions_address if addr not in addresses]
+        stale = [self.owned_breakpoints.pop(addr) for addr in addresses if addr in self.owned_breakpoints]
+        # deleted once gdb is done unloading the object
+        gdb.post_event(lambda: [bp.delete() for bp in stale if bp.is_valid()])
+
+    def set_library_pattern(self, pattern: Optional[str]) -> None:
+        """Trace the shared objects matching `pattern`, the ones already loaded are discovered now."""
+        self.library_pattern = pattern
+        main_binary = gdb.current_progspace().filename
+        if pattern is None:
+            for path in [path for path in self.objfile_functions if path != main_binary]:
+                del self.objfile_functions[path]
+            self.proc_functions_address = list(self.objfile_functions.get(main_binary, ()))
+            print("[+] Tracing the binary only.")
+            return
+
+        for objfile in gdb.objfiles():
+            if self._wants_objfile(objfile):
+                try:
+                    addresses = self.discover_objfile(objfile.filename)
+                except Exception as e:
+                    print(f"[!] Could not discover {objfile.filename}: {e}")
+                    continue
+                self.proc_functions_address = [*self.proc_functions_address, *addresses]
+        self.print_objfiles()
+
+    def print_objfiles(self) -> None:
+        print(f"[*] Traced objects (libraries matching: {self.library_pattern or 'none'}):")
+        for path, addresses in self.objfile_functions.items():
+            print(f"- {path} | {len(addresses)} functions")
+
+    def get_call_graph(self) -> CallGraph:
+        """The direct calls between every discovered function (not only the armed ones), per traced object."""
+        graph = CallGraph(addr for functions in self.objfile_functions.values() for addr in functions)
+        main_binary = gdb.current_progspace().filename
+        for path in self.objfile_functions:
+            finder = FunctionFinder(objfile=None if path == main_binary else path)
+            graph.add_calls(finder.iter_call_sites())
+        return graph
 
     def on_stop(self, event):
-        if not self.running:
+        # signals and stepping stop too, only breakpoint hits are recorded (and resumed)
+        if not self.running or not isinstance(event, gdb.BreakpointEvent):
             return
 
+        entered = time.perf_counter_ns()
+        stats = self.stats
+        gap_start = self._resumed_at or entered
+        if self._resumed_at:
+            # gdb resuming, the inferior running and gdb reporting the stop, since the previous `continue`
+            stats.record("stop_gap", entered - self._resumed_at)
+        stats.count("stops")
+
         try:
             frame = gdb.newest_frame()
             if not frame:
                 return
 
-            addr = hex(frame.pc())
-            name = frame.name() or "<stripped>"
+            addr = frame.pc()
+            thread = gdb.selected_thread().num
+            self.log_event(addr, EVENT_ENTRY)
+            resolved = time.perf_counter_ns()
+            stats.record("resolve", resolved - entered)
+
+            if self.coverage:
+                # off before resuming so it never traps again this round, the next `break_functions` re-enables it
+                for bp in event.breakpoints:
+                    if self.owned_breakpoints.get(addr) is bp:
+                        bp.enabled = False
 
             with self.lock:
-                if addr in self.break_info:
-                    self.break_info[addr].count += 1
-                else:
-                    self.break_info[addr] = TraceCallInfo(name=name, address=addr)
+                locked = time.perf_counter_ns()
+                stats.record("lock_wait", locked - resolved)
+                shard = self.thread_break_info.get(thread)
+                if shard is None:
+                    shard = self.thread_break_info[thread] = BreakInfo()
+                if shard.record(addr):
+                    stats.count("new_functions")
                     if self.debug:
-                        print(f"[NEW] {name:30} @ {addr}")
+                        print(f"[NEW] {self.symbolizer.name(addr):30} @ 0x{addr:x} (thread {thread})")
+                stats.record("record", time.perf_counter_ns() - locked)
         except Exception as e:
+            stats.count("errors")
             print("Error in on_stop:", e)
 
+        resuming = time.perf_counter_ns()
+        stats.record("handler", resuming - entered)
+        self._resumed_at = resuming
+        # a stop while `continue` runs nests its handler inside this call, its time is not ours
+        self._nested_ns = 0
+
         # Safe resume (deferred)
         # gdb.post_event(lambda: gdb.execute("continue", to_string=True))
         gdb.execute("continue", to_string=True)
+
+        returned = time.perf_counter_ns()
+        stats.record("continue", returned - resuming - self._nested_ns)
+        # seen by the handler this one is nested in (if any), our gap and span are not its `continue`
+        self._nested_ns = returned - gap_start
     
+    def log_event(self, pc: int, event: int) -> None:
+        if self.trace_log is not None:
+            self.trace_log.append(gdb.selected_thread().ptid[1], pc, event)
+
+    def set_trace_log(self, path: str = None, capacity: int = DEFAULT_TRACE_CAPACITY) -> None:
+        """Start logging to `path` (replacing the current log), or stop logging when it is None."""
+        if self.trace_log is not None:
+            self.trace_log.close()
+            print(f"[+] Closed trace log {self.trace_log.path} ({self.trace_log.count} records).")
+            self.trace_log = None
+
+        if path is not None:
+            self.trace_log = TraceLogWriter(path, capacity)
+            print(f"[+] Logging stops to {path} ({capacity} records ring).")
+
+    def count_armed(self) -> int:
+        """Owned breakpoints still armed, in coverage mode the ones not hit yet."""
+        return sum(1 for bp in self.owned_breakpoints.values() if bp.is_valid() and bp.enabled)
+
+    def _sample_armed_count(self) -> None:
+        # runs in the gdb thread, the round watcher posts it
+        if self.running:
+            self.armed_timeline.append((time.time() - self.start_time, self.count_armed()))
+
     def set_break_addresses(self, proc_functions_address: list[int] = None) -> None:
         """
         Because this is for use of another gdb plugin, we support communication through 
@@ -100,99 +308,354 @@ class BreakOnFunctions(gdb.Command):
         self.proc_functions_address = proc_functions_address
         print(f"[*] Setting breakpoints at {len(self.proc_functions_address)} addresses.")
 
-    def get_break_info(self) -> BreakInfo:
-        return self.break_info
+    def get_break_info(self, thread: int = None) -> BreakInfo:
+        """The hits of one gdb thread, or of the whole process when `thread` is None."""
+        with self.lock:
+            if thread is not None:
+                return self.thread_break_info.get(thread, BreakInfo())
+            if len(self.thread_break_info) == 1:
+                return next(iter(self.thread_break_info.values()))
+            merged = BreakInfo()
+            for shard in self.thread_break_info.values():
+                merged.merge(shard)
+            return merged
+
+    def symbolize(self, break_info: BreakInfo) -> BreakInfo:
+        """Fill in the names the stops left out, returns `break_info`."""
+        for info in break_info.values():
+            if info.name is None:
+                info.name = self.symbolizer.name(info.address)
+        return break_info
+
+    def set_thread_filter(self, threads: list[int] = None) -> None:
+        self.thread_filter = sorted(set(threads)) if threads else None
+        print(f"[*] Breaking in threads: {', '.join(map(str, self.thread_filter)) if self.thread_filter else 'all'}")
+
+    def _restrict_to_threads(self, bp: gdb.Breakpoint) -> None:
+        """A single thread is native to gdb breakpoints, several are a condition gdb checks without python."""
+        if not self.thread_filter:
+            return
+        if len(self.thread_filter) == 1:
+            bp.thread = self.thread_filter[0]
+        else:
+            bp.condition = " || ".join(f"$_thread == {thread}" for thread in self.thread_filter)
 
     def break_functions(self):
-        for addr in self.proc_functions_address:
-            bp = gdb.Breakpoint(f"*0x{addr:x}")
-            bp.silent = True
-            print(f"[*] Breakpoint set at 0x{addr:x}")
-
-        print(f"[+] Set {len(self.proc_functions_address)} breakpoints.")
-        
-        
-
-    def start(self, timeout: float = None) -> None:
+        """
+        Arm a breakpoint on every address in `proc_functions_address`.
+        Breakpoints left from a previous iteration are re-enabled instead of recreated, and the ones
+        no longer wanted are deleted. They are internal, so gdb prints nothing per address.
+        """
+        start_time = time.perf_counter()
+        wanted = set(self.proc_functions_address)
+        deleted = 0
+
+        filter_changed = self.thread_filter != self._armed_thread_filter
+        self._armed_thread_filter = self.thread_filter
+
+        for addr, bp in list(self.owned_breakpoints.items()):
+            # deleted behind our back (by the user, or an unloaded object)
+            if not bp.is_valid():
+                del self.owned_breakpoints[addr]
+            elif addr not in wanted or filter_changed:
+                bp.delete()
+                del self.owned_breakpoints[addr]
+                deleted += 1
+
+        created, reused = self._arm_addresses(wanted)
+
+        self.arm_stats["arm_seconds"] = time.perf_counter() - start_time
+        self.arm_stats.update(created=created, reused=reused, deleted=deleted)
+        print(f"[+] Set {len(wanted)} breakpoints ({created} new, {reused} reused) "
+              f"in {self.arm_stats['arm_seconds']:.3f}s.")
+
+    def _arm_addresses(self, addresses) -> tuple[int, int]:
+        """Enable the owned breakpoints at `addresses`, creating the missing ones. Returns (created, reused)."""
+        created = reused = 0
+        for addr in addresses:
+            bp = self.owned_breakpoints.get(addr)
+            if bp is None:
+                # in coverage mode `on_stop` disables each one after its first hit
+                bp = gdb.Breakpoint(f"*0x{addr:x}", internal=True)
+                bp.silent = True
+                self._restrict_to_threads(bp)
+                self.owned_breakpoints[addr] = bp
+                created += 1
+            else:
+                bp.enabled = True
+                reused += 1
+        return created, reused
+
+    def disarm_functions(self) -> None:
+        """Disable the breakpoints this tool owns (and only those), keeping them for the next iteration."""
+        start_time = time.perf_counter()
+        for bp in self.owned_breakpoints.values():
+            if bp.is_valid() and bp.enabled:
+                bp.enabled = False
+        self.arm_stats["disarm_seconds"] = time.perf_counter() - start_time
+
+    def delete_breakpoints(self) -> None:
+        for bp in self.owned_breakpoints.values():
+            if bp.is_valid():
+                bp.delete()
+        self.owned_breakpoints.clear()
+
+    def start(self, timeout: float = None, coverage: bool = False) -> None:
         if self.running:
             print("[-] Breaking already running.")
             return
         
         self.running = True
-        self.break_info = {}
+        self.round_id += 1
+        self.coverage = coverage
+        self.thread_break_info = {}
+        self.armed_timeline = []
+        self.start_time = time.time()
+        self.round_timings = {"start": time.perf_counter()}
+        self.stopped.clear()
+        self.trigger_done.clear()
         
         gdb.events.stop.connect(self.on_stop_function)
         self.break_functions()
+        if self.coverage:
+            self._sample_armed_count()
         
-        self.can_run_script = True
+        self.round_timings["armed"] = time.perf_counter()
+        self._resumed_at = 0
+        self._round_cpu_ns = read_process_cpu_ns(gdb.selected_inferior().pid)
+        self.armed.set()
     
-        # if timeout:
-        stop_thread = threading.Thread(target=self.stop, args=(timeout,))
-        stop_thread.start()
+        watcher = threading.Thread(target=self._wait_for_round_end, args=(timeout,), daemon=True)
+        watcher.start()
 
         gdb.execute("continue")
 
-    def stop(self, timeout: float = None) -> None:
+    def _wait_for_round_end(self, timeout: float = None) -> None:
+        """
+        Runs outside the gdb thread: wakes up as soon as the trigger is done (or the timeout expires)
+        and hands the teardown to the gdb thread, gdb's API is not thread safe.
+        In coverage mode it also samples the armed count every `COVERAGE_SAMPLE_INTERVAL`, hits or not.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.trigger_done.is_set():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            if not self.coverage:
+                self.trigger_done.wait(remaining)
+                continue
+            if self.trigger_done.wait(COVERAGE_SAMPLE_INTERVAL if remaining is None else min(remaining, COVERAGE_SAMPLE_INTERVAL)):
+                break
+            # counted in the gdb thread, gdb's API is not thread safe
+            gdb.post_event(self._sample_armed_count)
+        self.round_timings.setdefault("trigger_done", time.perf_counter())
+        gdb.post_event(self.stop)
+
+    def trigger_finished(self, round_id: int = None) -> None:
+        """
+        Called by whoever drives the target once it is done, ends the round right away.
+        `round_id` is the round the trigger ran in (read once `armed` is set), a trigger outliving
+        its round (timed out) must not end the next one. None ends the current round.
+        """
+        if round_id is not None and round_id != self.round_id:
+            return
+        self.round_timings.setdefault("trigger_done", time.perf_counter())
+        self.trigger_done.set()
+
+    def stop(self) -> None:
         if not self.running:
             print("[-] Breaking not running.")    
             return
-         
-        if timeout:
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                time.sleep(0.2)
-        else:
-            while self.can_run_script:
-                time.sleep(0.1)
-        
-        for bp in gdb.breakpoints():
-            bp.delete()
+
+        self.armed.clear()
+        if self.coverage:
+            self._sample_armed_count()
+            print(f"[*] {self.armed_timeline[-1][1]} breakpoints were never hit.")
+
+        self.disarm_functions()
         
         gdb.events.stop.disconnect(self.on_stop_function)
-        
-        # give some time for the breakpoints to exit
-        # this is not perfect but will do for now
-        time.sleep(0.2)
 
-        print("[+] Removed breakpoints.")
+        print(f"[+] Disarmed breakpoints in {self.arm_stats['disarm_seconds']:.3f}s.")
         print("[+] Stopping trace.")
         self.running = False
-        gdb.execute("interrupt")
-
-    def print_results(self):
+        try:
+            gdb.execute("interrupt")
+        except gdb.error:
+            # the inferior is not running (e.g. it exited)
+            pass
+
+        if self.trace_log is not None:
+            self.trace_log.flush()
+
+        self.round_timings["stopped"] = time.perf_counter()
+        self.record_round_stats()
+        print(f"[*] Round: {self.format_round_timings()}")
+        self.stopped.set()
+
+    def record_round_stats(self) -> None:
+        """Round phases into the histograms, and how much of the round the inferior spent on a CPU."""
+        breakdown = self.get_round_breakdown()
+        for phase, seconds in breakdown.items():
+            self.stats.record(f"round_{phase}", int(seconds * 1e9))
+        self.stats.count("rounds")
+
+        cpu_ns = read_process_cpu_ns(gdb.selected_inferior().pid)
+        if cpu_ns is not None and self._round_cpu_ns is not None:
+            self.stats.count("inferior_cpu_ns", cpu_ns - self._round_cpu_ns)
+            self.stats.count("round_run_ns", int(breakdown.get("run", 0) * 1e9))
+
+    def print_stats(self) -> None:
+        print("[*] Hot path stats (durations from perf_counter, p50/p99 exact to a factor of 2):")
+        print(self.stats.format())
+        counters = self.stats.counters
+        if counters.get("round_run_ns"):
+            share = counters.get("inferior_cpu_ns", 0) / counters["round_run_ns"]
+            print(f"[*] The inferior was on a CPU for {share:.1%} of the rounds' run time.")
+        # the table is cached until something remaps memory, see `MappingTable`
+        print(f"[*] Memory map read {mapping_table.reads} times.")
+
+    def get_round_breakdown(self) -> dict[str, float]:
+        """Seconds spent arming, running the trigger and tearing down the last round."""
+        timings = self.round_timings
+        if "stopped" not in timings:
+            return {}
+        return {
+            "arm": timings["armed"] - timings["start"],
+            "run": timings["trigger_done"] - timings["armed"],
+            "teardown": timings["stopped"] - timings["trigger_done"],
+            "total": timings["stopped"] - timings["start"],
+        }
+
+    def format_round_timings(self) -> str:
+        return " | ".join(f"{phase} {seconds:.3f}s" for phase, seconds in self.get_round_breakdown().items())
+
+    def print_results(self, per_thread: bool = False):
         print("\n[+] Traced Function Calls:")
+        tables = sorted(self.thread_break_info.items()) if per_thread else [(None, self.get_break_info())]
         with self.lock:
-            for info in sorted(self.break_info.values(), key=lambda x: x.count, reverse=True):
-                print(f"- {info.name:30} @ {info.address} | called {info.count} times")
+            for thread, break_info in tables:
+                self.symbolize(break_info)
+                if thread is not None:
+                    print(f"[*] Thread {thread}:")
+                for info in sorted(break_info.values(), key=lambda x: x.count, reverse=True):
+                    print(f"- {info.name:30} @ 0x{info.address:x} | called {info.count} times")
+
+            if self.coverage:
+                print("[*] Armed breakpoints over time:")
+                for elapsed, armed in self.armed_timeline:
+                    print(f"\t{elapsed:8.2f}s  {armed} armed")
+
+            stats = self.arm_stats
+            print(f"[*] Breakpoints: {stats['created']} created, {stats['reused']} reused, {stats['deleted']} deleted | "
+                  f"arm {stats['arm_seconds']:.3f}s, disarm {stats['disarm_seconds']:.3f}s")
         print("[+] End of trace.")
 
     def invoke(self, arg, from_tty):
         args = arg.strip().split()
 
         if not args:
-            print("Usage: break_on_functions start <timeout> [debug] | stop | print | set_break_addresses <function1> <function2> ...")
+            print("Usage: break_on_functions start <timeout> [debug] [--coverage] | stop | print [--threads] | threads <n,m,...|all> | clear | log <path> [capacity] | log off | libs [on [glob] | off] | stats [reset | on | off | json <path>] | scan [--jobs N] [--chunk-size BYTES] [--no-cache] | set_break_addresses <function1> <function2> ...")
             return
 
         cmd = args[0]
 
         if cmd == "start":
+            # in coverage mode only the first hit of each function is recorded (with a count of 1)
+            coverage = "--coverage" in args
+            args = [arg for arg in args if arg != "--coverage"]
+
             timeout = float(args[1]) if len(args) > 1 else None
             
             if len(args) < 2:
                 print("[#] Missing timeout, it will wait for a stop from the client.")
             
             self.debug = len(args) > 2 and args[2].lower() == "debug"
-            self.start(timeout)
+            self.start(timeout, coverage)
 
         elif cmd == "stop":
-            self.stop()
+            # the round watcher performs the actual teardown
+            self.trigger_finished()
         
         elif cmd == "test":
             gdb.shared_list232424 = [1,23,4]
             print(gdb.shared_list232424)
 
         elif cmd == "print":
-            self.print_results()
+            self.print_results(per_thread="--threads" in args)
+
+        elif cmd == "threads":
+            if len(args) < 2:
+                print("[#] Missing thread numbers")
+                return
+            try:
+                threads = None if args[1] == "all" else [int(thread) for thread in args[1].split(",")]
+            except ValueError as e:
+                print(f"[!] Bad thread number: {e}")
+                return
+            self.set_thread_filter(threads)
+
+        elif cmd == "log":
+            if len(args) < 2:
+                print("[#] Missing trace log path")
+                return
+            # checked before the current log is closed
+            try:
+                capacity = positive_int(args[2]) if len(args) > 2 else DEFAULT_TRACE_CAPACITY
+            except ValueError as e:
+                print(f"[!] Bad trace log capacity: {e}")
+                return
+            try:
+                self.set_trace_log(None if args[1] == "off" else args[1], capacity)
+            except (OSError, ValueError) as e:
+                print(f"[!] Can't open trace log: {e}")
+
+        elif cmd == "stats":
+            action = args[1] if len(args) > 1 else "print"
+            if action == "print":
+                self.print_stats()
+            elif action == "reset":
+                self.stats.reset()
+                print("[+] Reset the stats.")
+            elif action in ("on", "off"):
+                self.stats.enabled = action == "on"
+                print(f"[+] Stats {action}.")
+            elif action == "json":
+                if len(args) < 3:
+                    print("[#] Missing JSON path")
+                    return
+                try:
+                    with open(args[2], "w") as f:
+                        self.stats.write_json(f)
+                except OSError as e:
+                    print(f"[!] Can't write stats: {e}")
+                    return
+                print(f"[+] Wrote the stats to {args[2]}")
+            else:
+                print(f"[#] Unknown stats action: {action}")
+
+        elif cmd == "clear":
+            self.delete_breakpoints()
+            print("[+] Deleted breakpoints.")
+
+        elif cmd == "libs":
+            if len(args) < 2:
+                self.print_objfiles()
+            elif args[1] == "off":
+                self.set_library_pattern(None)
+            elif args[1] == "on":
+                self.set_library_pattern(args[2] if len(args) > 2 else "*")
+            else:
+                print(f"[#] Unknown libs action: {args[1]}")
+
+        elif cmd == "scan":
+            try:
+                finder_options = parse_finder_options(args[1:])
+            except ValueError as e:
+                print(f"[!] Bad option: {e}")
+                return
+            self.proc_functions_address = self._get_initial_functions(**finder_options)
+            print(f"[+] Found {len(self.proc_functions_address)} functions.")
 
         elif cmd == "set_break_addresses":
             functions = list(map(lambda x: int (x, 16), args[1:]))
@@ -210,10 +673,19 @@ class BreakOnFunctions(gdb.Command):
         word_index = len(text.split())
 
         if word_index == 0 or (word_index == 1 and word):
-            options = ["start", "stop", "print", "set_break_addresses"]
+            options = ["start", "stop", "print", "threads", "clear", "log", "libs", "stats", "scan", "set_break_addresses"]
         
-        elif text.strip() == "start":
-            options = ["debug"]
+        elif text.split()[0] == "start":
+            options = ["debug", "--coverage"]
+
+        elif text.split()[0] == "scan":
+            options = ["--jobs", "--chunk-size", "--no-cache"]
+
+        elif text.split()[0] == "libs":
+            options = ["on", "off"]
+
+        elif text.split()[0] == "stats":
+            options = ["reset", "on", "off", "json"]
 
         if word:
             return [opt for opt in options if opt.startswith(word)]
@@ -0,0 +1,101 @@
+from bisect import bisect_right
+import struct
+from typing import Iterable, Iterator
+
+# Longest direct call/jump decoded below, the overlap needed between chunks
+CALL_SITE_SIZE: int = 5
+
+
+def _x86_call_sites(buffer, start: int, end: int, base_addr: int, address_mask: int) -> Iterator[tuple[int, int]]:
+    # call rel32 (e8), and jmp rel32 (e9) for tail calls. The opcode byte may as well be inside another
+    # instruction, those hits are dropped by the caller unless they decode to a known function start.
+    for opcode in (b"\xe8", b"\xe9"):
+        offset = buffer.find(opcode, start, end)
+        while offset != -1:
+            if offset + CALL_SITE_SIZE <= len(buffer):
+                rel = struct.unpack_from("<i", buffer, offset + 1)[0]
+                site = base_addr + offset
+                yield site, (site + CALL_SITE_SIZE + rel) & address_mask
+            offset = buffer.find(opcode, offset + 1, end)
+
+
+def _aarch64_call_sites(buffer, start: int, end: int, base_addr: int) -> Iterator[tuple[int, int]]:
+    # bl imm26, and b imm26 for tail calls; instructions are 4 byte aligned
+    first = start + (-(base_addr + start) % 4)
+    for index, (insn,) in enumerate(struct.iter_unpack("<I", buffer[first:end - (end - first) % 4])):
+        if insn & 0x7c000000 == 0x14000000:
+            rel = (insn & 0x3ffffff) - ((insn & 0x2000000) << 1)
+            site = base_addr + first + index * 4
+            yield site, site + rel * 4
+
+
+def _arm_call_sites(buffer, start: int, end: int, base_addr: int) -> Iterator[tuple[int, int]]:
+    # A32 bl{cond} / b{cond} imm24, the pc reads 8 bytes ahead
+    first = start + (-(base_addr + start) % 4)
+    for index, (insn,) in enumerate(struct.iter_unpack("<I", buffer[first:end - (end - first) % 4])):
+        if insn & 0x0e000000 == 0x0a000000 and insn >> 28 != 0xf:
+            rel = (insn & 0xffffff) - ((insn & 0x800000) << 1)
+            site = base_addr + first + index * 4
+            yield site, site + 8 + rel * 4
+
+
+def find_call_sites(arch: str, buffer, start: int, end: int, base_addr: int) -> Iterator[tuple[int, int]]:
+    """
+    Yield `(site, target)` for the direct calls (and tail jumps) starting in `buffer[start:end]`,
+    `base_addr` being the address of `buffer[0]`. The buffer needs `find` (bytes, mmap).
+    Architectures without a decoder yield nothing.
+    """
+    arch = arch.split(":")[-1]
+    if arch == "x86-64":
+        yield from _x86_call_sites(buffer, start, end, base_addr, (1 << 64) - 1)
+    elif arch == "i386":
+        yield from _x86_call_sites(buffer, start, end, base_addr, (1 << 32) - 1)
+    elif arch == "aarch64":
+        yield from _aarch64_call_sites(buffer, start, end, base_addr)
+    elif arch == "arm":
+        yield from _arm_call_sites(buffer, start, end, base_addr)
+
+
+class CallGraph:
+    """
+    Static call graph over the discovered functions, as callee and caller adjacency sets.
+    Only edges landing exactly on a known function start are kept, which filters out the bytes
+    that merely look like a call; the site is attributed to the closest function start below it.
+    Indirect calls (vtables, callbacks, PLT) are invisible, their targets look like entries.
+    """
+
+    def __init__(self, functions: Iterable[int]):
+        self.functions = sorted(set(functions))
+        self._function_set = set(self.functions)
+        self.callees: dict[int, set[int]] = {}
+        self.callers: dict[int, set[int]] = {}
+        self.edges = 0
+
+    def __len__(self) -> int:
+        return len(self.functions)
+
+    def add_calls(self, calls: Iterable[tuple[int, int]]) -> None:
+        functions = self.functions
+        for site, target in calls:
+            if target not in self._function_set:
+                continue
+            index = bisect_right(functions, site) - 1
+            if index < 0:
+                continue
+            caller = functions[index]
+            callees = self.callees.setdefault(caller, set())
+            if target not in callees:
+                callees.add(target)
+                self.callers.setdefault(target, set()).add(caller)
+                self.edges += 1
+
+    def entries(self) -> list[int]:
+        """Functions nothing calls directly: main, thread routines, handlers reached through pointers."""
+        return [addr for addr in self.functions if addr not in self.callers]
+
+    def frontier(self, addresses: Iterable[int], explored: set[int]) -> list[int]:
+        """The direct callees of `addresses` not `explored` yet."""
+        frontier = set()
+        for addr in addresses:
+            frontier.update(self.callees.get(addr, ()))
+        return sorted(frontier - explored)
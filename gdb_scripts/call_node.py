@@ -1,17 +1,131 @@
+import json
+from typing import Callable, Iterator, Optional, TextIO
+
+# how many lines are buffered before a write, printing node by node is slow in the gdb console
+WRITE_BATCH_SIZE: int = 1024
+
+
 class CallNode:
+    """
+    One calling context: the same function called from two different paths is two nodes.
+    `calls` counts how many times the edge from the parent was taken, `self_hits` / `total_hits`
+    are the samples that landed in this node exclusively / including its callees.
+    """
+    __slots__ = ("name", "addr", "children", "calls", "self_hits", "total_hits")
+
     def __init__(self, name, addr):
         self.name = name
         self.addr = addr
-        self.children = []
-    
+        # created on the first child, most nodes are leaves
+        self.children: Optional[dict[int, "CallNode"]] = None
+        self.calls = 0
+        self.self_hits = 0
+        self.total_hits = 0
+
     def add_child(self, child):
-        for existing in self.children:
-            if existing.addr == child.addr:
-                return existing  # Don't duplicate
-        self.children.append(child)
-        return child
-
-    def print_tree(self, indent=0):
-        print("  " * indent + f"{self.name} (0x{self.addr:x})")
-        for child in self.children:
-            child.print_tree(indent + 1)
+        if self.children is None:
+            self.children = {}
+        # Don't duplicate
+        return self.children.setdefault(child.addr, child)
+
+    def child(self, name, addr) -> "CallNode":
+        """Get or create the child for `addr`, without allocating a node when it exists."""
+        if self.children is not None and (existing := self.children.get(addr)) is not None:
+            return existing
+        return self.add_child(CallNode(name, addr))
+
+    def iter_children(self) -> Iterator["CallNode"]:
+        if self.children is not None:
+            yield from self.children.values()
+
+    def merge(self, other: "CallNode") -> "CallNode":
+        """Add the counters and the subtree of `other` (same function) into this node, returns self."""
+        pending = [(self, other)]
+        while pending:
+            target, source = pending.pop()
+            target.calls += source.calls
+            target.self_hits += source.self_hits
+            target.total_hits += source.total_hits
+            for child in source.iter_children():
+                pending.append((target.child(child.name, child.addr), child))
+        return self
+
+    def walk(self) -> Iterator[tuple[int, "CallNode"]]:
+        """Depth-first `(depth, node)` pairs, iterative so deep recursions don't hit the recursion limit."""
+        pending = [(0, self)]
+        while pending:
+            depth, node = pending.pop()
+            yield depth, node
+            if node.children is not None:
+                pending.extend((depth + 1, child) for child in reversed(list(node.children.values())))
+
+    def describe(self) -> str:
+        counters = []
+        if self.calls:
+            counters.append(f"calls={self.calls}")
+        if self.total_hits:
+            counters.append(f"self={self.self_hits} total={self.total_hits}")
+        suffix = f" [{' '.join(counters)}]" if counters else ""
+        return f"{self.name} (0x{self.addr:x}){suffix}"
+
+    def print_tree(self, indent=0, out: Optional[Callable[[str], None]] = None):
+        write = out or print
+        lines = []
+        for depth, node in self.walk():
+            lines.append("  " * (indent + depth) + node.describe())
+            if len(lines) >= WRITE_BATCH_SIZE:
+                write("\n".join(lines))
+                lines.clear()
+        if lines:
+            write("\n".join(lines))
+
+
+def iter_folded(roots: list[CallNode], weight: Callable[[CallNode], int] = None) -> Iterator[str]:
+    """
+    Folded stacks (`root;child;leaf count`), the input format of flamegraph.pl / speedscope.
+    The weight defaults to the exclusive samples, or to the call counts for trees without samples.
+    """
+    if weight is None:
+        sampled = any(root.total_hits for root in roots)
+        weight = (lambda node: node.self_hits) if sampled else (lambda node: node.calls)
+
+    for root in roots:
+        path: list[str] = []
+        for depth, node in root.walk():
+            del path[depth:]
+            path.append(node.name or f"0x{node.addr:x}")
+            if count := weight(node):
+                yield f"{';'.join(path)} {count}"
+
+
+def write_folded(roots: list[CallNode], stream: TextIO) -> None:
+    for line in iter_folded(roots):
+        stream.write(line + "\n")
+
+
+def write_json(roots: list[CallNode], stream: TextIO) -> None:
+    """Stream the trees as a JSON list of nested nodes, without building the document in memory."""
+    stream.write("[")
+    for index, root in enumerate(roots):
+        if index:
+            stream.write(",")
+        # the stack holds how many children are still open per depth, to close the brackets
+        open_children: list[int] = []
+        for depth, node in root.walk():
+            while len(open_children) > depth:
+                open_children.pop()
+                stream.write("]}")
+            if open_children:
+                if open_children[-1]:
+                    stream.write(",")
+                open_children[-1] += 1
+            header = json.dumps({
+                "name": node.name, "addr": node.addr, "calls": node.calls,
+                "self_hits": node.self_hits, "total_hits": node.total_hits,
+            })
+            stream.write(header[:-1] + ', "children": [')
+            open_children.append(0)
+        while open_children:
+            open_children.pop()
+            stream.write("]}")
+    stream.write("]\n")
@@ -0,0 +1,104 @@
+import os
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from signature_scanner import CONFIRM_WINDOW_SIZE
+
+
+class Option(NamedTuple):
+    # keyword the value is stored under
+    key: str
+    # converts the flag's argument, None for a switch that takes none
+    parse: Optional[Callable[[str], object]] = None
+    # stored for a switch
+    value: object = True
+
+
+def parse_options(args: Iterable[str], options: dict[str, Option]) -> dict:
+    """
+    Parse `--flag [value]` arguments into a dict of keyword arguments, following `options`.
+    Raises ValueError on an unknown flag, a missing value or a value its option rejects.
+    """
+    parsed = {}
+    args = iter(args)
+    for arg in args:
+        option = options.get(arg)
+        if option is None:
+            raise ValueError(f"unknown option {arg}")
+        if option.parse is None:
+            parsed[option.key] = option.value
+            continue
+
+        value = next(args, None)
+        if value is None:
+            raise ValueError(f"{arg} needs a value")
+        try:
+            parsed[option.key] = option.parse(value)
+        except ValueError as e:
+            raise ValueError(f"{arg}: {e}") from None
+    return parsed
+
+
+def positive_int(text: str) -> int:
+    value = int(text, 0)
+    if value <= 0:
+        raise ValueError(f"expected a positive integer, got {text}")
+    return value
+
+
+def positive_float(text: str) -> float:
+    value = float(text)
+    if not value > 0:
+        raise ValueError(f"expected a positive number, got {text}")
+    return value
+
+
+def one_of(choices: Iterable[str]) -> Callable[[str], str]:
+    choices = tuple(choices)
+
+    def parse(text: str) -> str:
+        if text not in choices:
+            raise ValueError(f"expected one of {', '.join(choices)}, got {text}")
+        return text
+    return parse
+
+
+def parse_jobs(text: str) -> int:
+    # more than 1 forks gdb itself for the workers (see `ChunkedScanner._make_executor`), serial is the default.
+    # Measured by `run_benchmarks.py --jobs N` against the serial scan.
+    jobs = int(text)
+    if jobs < 0:
+        raise ValueError(f"expected 0 (every core) or more, got {text}")
+    return jobs or os.cpu_count() or 1
+
+
+def parse_chunk_size(text: str) -> int:
+    chunk_size = int(text, 0)
+    # the chunks carry the confirm window as overlap, a smaller chunk would be all overlap
+    if chunk_size < CONFIRM_WINDOW_SIZE:
+        raise ValueError(f"expected at least {CONFIRM_WINDOW_SIZE} bytes, got {text}")
+    return chunk_size
+
+
+FINDER_OPTIONS: dict[str, Option] = {
+    "--no-cache": Option("use_cache", value=False),
+    "--jobs": Option("jobs", parse_jobs),
+    "--chunk-size": Option("chunk_size", parse_chunk_size),
+}
+
+def parse_finder_options(args: list[str]) -> dict:
+    """
+    Parse the discovery flags shared by the commands, `[--jobs N] [--chunk-size BYTES] [--no-cache]`,
+    into `FunctionFinder` keyword arguments. Scans are serial unless `--jobs` says otherwise, `--jobs 0` uses
+    every core. Raises ValueError on a bad option.
+    """
+    return parse_options(args, FINDER_OPTIONS)
+
+
+LOAD_OPTIONS: dict[str, Option] = {
+    "--concurrency": Option("concurrency", positive_int),
+    "--repeat": Option("repeat", positive_int),
+}
+
+def parse_load_options(args: list[str]) -> dict:
+    """Parse `[--concurrency N] [--repeat M]` into `RunTrigger.run` keyword arguments."""
+    return parse_options(args, LOAD_OPTIONS)
@@ -0,0 +1,425 @@
+from dataclasses import dataclass
+import mmap
+import struct
+from typing import Optional
+
+ELF_MAGIC: bytes = b"\x7fELF"
+
+ET_DYN: int = 3
+PT_LOAD: int = 1
+PT_NOTE: int = 4
+SHT_NOBITS: int = 8
+SHN_UNDEF: int = 0
+STT_FUNC: int = 2
+STT_GNU_IFUNC: int = 10
+NT_GNU_BUILD_ID: int = 3
+
+EM_386: int = 3
+EM_X86_64: int = 62
+
+# R_*_RELATIVE relocation type per e_machine, used to resolve .init_array entries of PIEs
+RELATIVE_RELOCATIONS: dict[int, int] = {
+    EM_386: 8,
+    EM_X86_64: 8,
+    40: 23,  # ARM
+    183: 1027,  # AArch64
+    8: 3,  # MIPS (REL32)
+}
+
+# DWARF pointer encodings (DW_EH_PE_*) used by .eh_frame and .eh_frame_hdr
+DW_EH_PE_OMIT: int = 0xff
+DW_EH_PE_ABSPTR: int = 0x00
+DW_EH_PE_ULEB128: int = 0x01
+DW_EH_PE_UDATA2: int = 0x02
+DW_EH_PE_UDATA4: int = 0x03
+DW_EH_PE_UDATA8: int = 0x04
+DW_EH_PE_SLEB128: int = 0x09
+DW_EH_PE_SDATA2: int = 0x0a
+DW_EH_PE_SDATA4: int = 0x0b
+DW_EH_PE_SDATA8: int = 0x0c
+DW_EH_PE_PCREL: int = 0x10
+DW_EH_PE_DATAREL: int = 0x30
+
+PLT_SECTIONS: tuple = (".plt", ".plt.sec", ".plt.got")
+DEFAULT_PLT_ENTRY_SIZE: int = 16
+
+
+@dataclass
+class ElfSection:
+    name: str
+    type: int
+    addr: int
+    offset: int
+    size: int
+    link: int
+    entsize: int
+
+
+@dataclass
+class FunctionRange:
+    start: int
+    size: int = 0
+    name: str = ""
+
+    @property
+    def end(self) -> int:
+        return self.start + self.size
+
+
+def read_uleb128(data, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def read_sleb128(data, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            if byte & 0x40:
+                result -= 1 << shift
+            return result, pos
+
+
+class ElfFile:
+    """
+    Minimal memory-mapped ELF reader.
+    Everything a function inventory needs (symbols, unwind tables, init arrays, PLT stubs) is read
+    straight from the file, in link-time addresses; use `load_bias` to relocate them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.data[:4] != ELF_MAGIC:
+            self.data.close()
+            raise ValueError(f"Not an ELF file: {path}")
+
+        self.is_64 = self.data[4] == 2
+        self.endian = "<" if self.data[5] == 1 else ">"
+        self.word_size = 8 if self.is_64 else 4
+        self.word_format = self.endian + ("Q" if self.is_64 else "I")
+
+        if self.is_64:
+            header = struct.unpack_from(self.endian + "HHIQQQIHHHHHH", self.data, 16)
+        else:
+            header = struct.unpack_from(self.endian + "HHIIIIIHHHHHH", self.data, 16)
+        (self.type, self.machine, _, self.entry, self.ph_off, self.sh_off, _, _,
+         self.ph_entsize, self.ph_num, self.sh_entsize, self.sh_num, self.sh_strndx) = header
+
+        self.segments = self._parse_segments()
+        self.sections = self._parse_sections()
+
+    def close(self) -> None:
+        self.data.close()
+
+    def __enter__(self) -> "ElfFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _parse_segments(self) -> list[tuple]:
+        """Return `(type, offset, vaddr, filesz, memsz)` for every program header."""
+        segments = []
+        for index in range(self.ph_num):
+            pos = self.ph_off + index * self.ph_entsize
+            if self.is_64:
+                p_type, _, offset, vaddr, _, filesz, memsz, _ = struct.unpack_from(self.endian + "IIQQQQQQ", self.data, pos)
+            else:
+                p_type, offset, vaddr, _, filesz, memsz, _, _ = struct.unpack_from(self.endian + "IIIIIIII", self.data, pos)
+            segments.append((p_type, offset, vaddr, filesz, memsz))
+        return segments
+
+    def _parse_sections(self) -> dict[str, ElfSection]:
+        if not self.sh_off or not self.sh_num:
+            return {}
+
+        header_format = self.endian + ("IIQQQQIIQQ" if self.is_64 else "IIIIIIIIII")
+        raw_sections = [struct.unpack_from(header_format, self.data, self.sh_off + index * self.sh_entsize)
+                        for index in range(self.sh_num)]
+
+        names_offset = raw_sections[self.sh_strndx][4]
+        sections = {}
+        for sh_name, sh_type, _, addr, offset, size, link, _, _, entsize in raw_sections:
+            name = self._read_cstring(names_offset + sh_name)
+            sections.setdefault(name, ElfSection(name, sh_type, addr, offset, size, link, entsize))
+        return sections
+
+    def _read_cstring(self, offset: int) -> str:
+        end = self.data.find(b"\0", offset)
+        return self.data[offset:end].decode(errors="replace")
+
+    def section_data(self, section: ElfSection) -> memoryview:
+        if section.type == SHT_NOBITS:
+            return memoryview(b"")
+        return memoryview(self.data)[section.offset:section.offset + section.size]
+
+    @property
+    def is_pie(self) -> bool:
+        return self.type == ET_DYN
+
+    @property
+    def min_load_vaddr(self) -> int:
+        loads = [vaddr for p_type, _, vaddr, _, _ in self.segments if p_type == PT_LOAD]
+        return min(loads) & ~0xfff if loads else 0
+
+    def load_bias(self, load_base: int) -> int:
+        """The value to add to link-time addresses, given where the first segment got mapped."""
+        return load_base - self.min_load_vaddr if self.is_pie else 0
+
+    @property
+    def build_id(self) -> Optional[bytes]:
+        for p_type, offset, _, filesz, _ in self.segments:
+            if p_type != PT_NOTE:
+                continue
+            pos, end = offset, offset + filesz
+            while pos + 12 <= end:
+                name_size, desc_size, note_type = struct.unpack_from(self.endian + "III", self.data, pos)
+                pos += 12
+                name = self.data[pos:pos + name_size]
+                pos += (name_size + 3) & ~3
+                desc = self.data[pos:pos + desc_size]
+                pos += (desc_size + 3) & ~3
+                if note_type == NT_GNU_BUILD_ID and name.rstrip(b"\0") == b"GNU":
+                    return desc
+        return None
+
+    def function_symbols(self) -> list[FunctionRange]:
+        """Defined STT_FUNC / STT_GNU_IFUNC symbols from .symtab and .dynsym."""
+        if self.is_64:
+            sym_format = self.endian + "IBBHQQ"
+        else:
+            sym_format = self.endian + "IIIBBH"
+
+        functions = []
+        for table_name in (".symtab", ".dynsym"):
+            table = self.sections.get(table_name)
+            if table is None or table.type == SHT_NOBITS:
+                continue
+            strtab_offset = self._section_by_index(table.link).offset
+            data = self.section_data(table)
+            usable = len(data) - len(data) % struct.calcsize(sym_format)
+
+            for sym in struct.iter_unpack(sym_format, data[:usable]):
+                if self.is_64:
+                    st_name, st_info, _, st_shndx, value, size = sym
+                else:
+                    st_name, value, size, st_info, _, st_shndx = sym
+                if st_info & 0xf not in (STT_FUNC, STT_GNU_IFUNC) or st_shndx == SHN_UNDEF or not value:
+                    continue
+                functions.append(FunctionRange(value, size, self._read_cstring(strtab_offset + st_name)))
+        return functions
+
+    def _section_by_index(self, index: int) -> ElfSection:
+        header_format = self.endian + ("IIQQQQIIQQ" if self.is_64 else "IIIIIIIIII")
+        _, sh_type, _, addr, offset, size, link, _, _, entsize = struct.unpack_from(
+            header_format, self.data, self.sh_off + index * self.sh_entsize)
+        return ElfSection("", sh_type, addr, offset, size, link, entsize)
+
+    def _read_encoded(self, data, pos: int, encoding: int, section_addr: int, data_base: int = 0) -> tuple[int, int]:
+        """Decode a DW_EH_PE_* pointer at `data[pos]`, `section_addr` being the address of `data[0]`."""
+        value_format = encoding & 0x0f
+        start = pos
+        if value_format == DW_EH_PE_ABSPTR:
+            value = struct.unpack_from(self.word_format, data, pos)[0]
+            pos += self.word_size
+        elif value_format == DW_EH_PE_ULEB128:
+            value, pos = read_uleb128(data, pos)
+        elif value_format == DW_EH_PE_SLEB128:
+            value, pos = read_sleb128(data, pos)
+        else:
+            fmt = {
+                DW_EH_PE_UDATA2: "H", DW_EH_PE_UDATA4: "I", DW_EH_PE_UDATA8: "Q",
+                DW_EH_PE_SDATA2: "h", DW_EH_PE_SDATA4: "i", DW_EH_PE_SDATA8: "q",
+            }[value_format]
+            value = struct.unpack_from(self.endian + fmt, data, pos)[0]
+            pos += struct.calcsize(fmt)
+
+        application = encoding & 0x70
+        if application == DW_EH_PE_PCREL:
+            value += section_addr + start
+        elif application == DW_EH_PE_DATAREL:
+            value += data_base
+        return value & ((1 << (8 * self.word_size)) - 1), pos
+
+    def _parse_cie_encoding(self, data, pos: int, end: int) -> int:
+        """Return the FDE pointer encoding ('R' augmentation) of the CIE whose body starts at `pos`."""
+        version = data[pos]
+        pos += 1
+        aug_end = bytes(data[pos:end]).index(b"\0")
+        augmentation = bytes(data[pos:pos + aug_end])
+        pos += aug_end + 1
+
+        if b"eh" in augmentation:
+            pos += self.word_size
+        _, pos = read_uleb128(data, pos)  # code alignment
+        _, pos = read_sleb128(data, pos)  # data alignment
+        if version == 1:
+            pos += 1
+        else:
+            _, pos = read_uleb128(data, pos)  # return address register
+
+        if not augmentation.startswith(b"z"):
+            return DW_EH_PE_ABSPTR
+
+        _, pos = read_uleb128(data, pos)  # augmentation data length
+        for char in augmentation[1:]:
+            if char == ord("R"):
+                return data[pos]
+            if char == ord("L"):
+                pos += 1
+            elif char == ord("P"):
+                personality_encoding = data[pos]
+                _, pos = self._read_encoded(data, pos + 1, personality_encoding & 0x7f, 0)
+        return DW_EH_PE_ABSPTR
+
+    def fde_ranges(self) -> list[FunctionRange]:
+        """Exact `[pc_begin, pc_begin + pc_range)` bounds of every FDE in .eh_frame."""
+        section = self.sections.get(".eh_frame")
+        if section is None:
+            return []
+
+        data = self.section_data(section)
+        cie_encodings: dict[int, int] = {}
+        ranges = []
+        pos = 0
+        while pos + 4 <= len(data):
+            length = struct.unpack_from(self.endian + "I", data, pos)[0]
+            if length == 0:
+                break
+            header_size = 4
+            if length == 0xffffffff:
+                length = struct.unpack_from(self.endian + "Q", data, pos + 4)[0]
+                header_size = 12
+            entry_start = pos
+            body = pos + header_size
+            end = body + length
+            cie_id = struct.unpack_from(self.endian + "I", data, body)[0]
+
+            try:
+                if cie_id == 0:
+                    cie_encodings[entry_start] = self._parse_cie_encoding(data, body + 4, end)
+                else:
+                    # the CIE pointer is relative to its own position
+                    encoding = cie_encodings.get(body - cie_id, DW_EH_PE_ABSPTR)
+                    pc_begin, next_pos = self._read_encoded(data, body + 4, encoding, section.addr)
+                    pc_range, _ = self._read_encoded(data, next_pos, encoding & 0x0f, section.addr)
+                    if pc_begin:
+                        ranges.append(FunctionRange(pc_begin, pc_range))
+            except (struct.error, IndexError, KeyError, ValueError):
+                pass
+            pos = end
+        return ranges
+
+    def eh_frame_hdr_starts(self) -> list[int]:
+        """Function starts from the binary search table of .eh_frame_hdr, without touching the FDEs."""
+        section = self.sections.get(".eh_frame_hdr")
+        if section is None:
+            return []
+
+        data = self.section_data(section)
+        if len(data) < 4 or data[0] != 1:
+            return []
+
+        eh_frame_ptr_enc, fde_count_enc, table_enc = data[1], data[2], data[3]
+        if DW_EH_PE_OMIT in (eh_frame_ptr_enc, fde_count_enc, table_enc):
+            return []
+
+        try:
+            _, pos = self._read_encoded(data, 4, eh_frame_ptr_enc, section.addr, section.addr)
+            fde_count, pos = self._read_encoded(data, pos, fde_count_enc, section.addr, section.addr)
+            starts = []
+            for _ in range(fde_count):
+                initial_location, pos = self._read_encoded(data, pos, table_enc, section.addr, section.addr)
+                _, pos = self._read_encoded(data, pos, table_enc, section.addr, section.addr)
+                starts.append(initial_location)
+        except (struct.error, IndexError, KeyError):
+            return []
+        return starts
+
+    def _relative_relocations(self) -> dict[int, int]:
+        """Map of `r_offset -> addend` for the R_*_RELATIVE relocations of .rela.dyn."""
+        relative_type = RELATIVE_RELOCATIONS.get(self.machine)
+        section = self.sections.get(".rela.dyn")
+        if relative_type is None or section is None:
+            return {}
+
+        rela_format = self.endian + ("QQq" if self.is_64 else "IIi")
+        data = self.section_data(section)
+        usable = len(data) - len(data) % struct.calcsize(rela_format)
+        type_mask = 0xffffffff if self.is_64 else 0xff
+
+        return {
+            offset: addend
+            for offset, info, addend in struct.iter_unpack(rela_format, data[:usable])
+            if info & type_mask == relative_type
+        }
+
+    def init_array_functions(self) -> list[int]:
+        """Constructors and destructors from .init_array / .fini_array (resolving PIE relocations)."""
+        relocations = None
+        functions = []
+        for name in (".init_array", ".fini_array", ".preinit_array"):
+            section = self.sections.get(name)
+            if section is None:
+                continue
+            data = self.section_data(section)
+            usable = len(data) - len(data) % self.word_size
+            for index, (pointer,) in enumerate(struct.iter_unpack(self.word_format, data[:usable])):
+                if not pointer:
+                    if relocations is None:
+                        relocations = self._relative_relocations()
+                    pointer = relocations.get(section.addr + index * self.word_size, 0)
+                # -1 / 0 are used as list terminators by some toolchains
+                if pointer and pointer != (1 << (8 * self.word_size)) - 1:
+                    functions.append(pointer)
+        return functions
+
+    def plt_stubs(self) -> list[int]:
+        """The address of every PLT stub (x86 uses fixed size entries, other arches get the section start)."""
+        stubs = []
+        for name in PLT_SECTIONS:
+            section = self.sections.get(name)
+            if section is None or not section.size:
+                continue
+            if self.machine not in (EM_X86_64, EM_386):
+                stubs.append(section.addr)
+                continue
+            entry_size = section.entsize or DEFAULT_PLT_ENTRY_SIZE
+            stubs.extend(range(section.addr, section.addr + section.size, entry_size))
+        return stubs
+
+    def function_ranges(self) -> list[FunctionRange]:
+        """Symbols and FDEs merged by start address, symbols winning for the name and FDEs for the size."""
+        ranges: dict[int, FunctionRange] = {}
+        for fde in self.fde_ranges():
+            ranges[fde.start] = fde
+        for symbol in self.function_symbols():
+            if existing := ranges.get(symbol.start):
+                existing.name = existing.name or symbol.name
+                existing.size = existing.size or symbol.size
+            else:
+                ranges[symbol.start] = symbol
+        return sorted(ranges.values(), key=lambda function_range: function_range.start)
+
+    def function_starts(self) -> set[int]:
+        """Every function start address this file describes, in link-time addresses."""
+        starts = {function_range.start for function_range in self.function_ranges()}
+        starts.update(self.eh_frame_hdr_starts())
+        starts.update(self.init_array_functions())
+        starts.update(self.plt_stubs())
+        if self.entry:
+            starts.add(self.entry)
+        return starts
@@ -0,0 +1,92 @@
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterable, Optional
+
+from elf_reader import ElfFile
+
+CACHE_DIR: str = os.environ.get("GDB_INSPECTOR_CACHE", os.path.expanduser("~/.cache/gdb-inspector"))
+
+CACHE_MAGIC: bytes = b"GDBIFN01"
+# magic, binary size, binary mtime (ns), number of addresses
+CACHE_HEADER = struct.Struct("<8sQQQ")
+
+
+def read_build_id(path: str) -> Optional[bytes]:
+    """Return the GNU build-id note of an ELF file, or None if it has none."""
+    try:
+        with ElfFile(path) as elf:
+            return elf.build_id
+    except (ValueError, struct.error):
+        return None
+
+
+def binary_key(path: str, arch: str) -> str:
+    """Identify a binary by its build-id, or by a content hash when it was linked without one."""
+    if build_id := read_build_id(path):
+        digest = build_id.hex()
+    else:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+    return f"{digest}-{arch.replace(':', '_')}"
+
+
+class FunctionCache:
+    """
+    On-disk cache of the function addresses found in a binary.
+    Addresses are stored relative to the binary load base as a sorted uint64 array after a small
+    header, so a warm start is a single mmap and the table is valid across ASLR runs.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def path_for(self, binary_path: str, arch: str) -> str:
+        return os.path.join(self.cache_dir, binary_key(binary_path, arch) + ".bin")
+
+    def load(self, binary_path: str, arch: str) -> Optional[memoryview]:
+        """Return the cached offsets as a uint64 memoryview, or None on a miss or a stale entry."""
+        try:
+            cache_path = self.path_for(binary_path, arch)
+            stat = os.stat(binary_path)
+            with open(cache_path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mapped) < CACHE_HEADER.size:
+            return None
+
+        magic, size, mtime_ns, count = CACHE_HEADER.unpack_from(mapped)
+        if magic != CACHE_MAGIC or size != stat.st_size or mtime_ns != stat.st_mtime_ns \
+                or len(mapped) != CACHE_HEADER.size + count * 8:
+            # the binary was rebuilt in place (or the file is corrupt)
+            mapped.close()
+            self.invalidate(binary_path, arch)
+            return None
+
+        return memoryview(mapped)[CACHE_HEADER.size:].cast("Q")
+
+    def store(self, binary_path: str, arch: str, offsets: Iterable[int]) -> None:
+        table = array("Q", sorted(set(offsets)))
+        stat = os.stat(binary_path)
+        cache_path = self.path_for(binary_path, arch)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file first so a concurrent reader never sees a half written table
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(CACHE_HEADER.pack(CACHE_MAGIC, stat.st_size, stat.st_mtime_ns, len(table)))
+            f.write(table.tobytes())
+        os.replace(tmp_path, cache_path)
+
+    def invalidate(self, binary_path: str, arch: str) -> None:
+        try:
+            os.remove(self.path_for(binary_path, arch))
+        except OSError:
+            pass
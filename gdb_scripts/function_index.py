@@ -0,0 +1,40 @@
+from typing import Iterable
+
+
+class FunctionIndex:
+    """
+    Dense index over the sorted function addresses from `FunctionFinder`.
+    A set of functions becomes a bitmap (a python int, bit `i` for `addresses[i]`), so comparing
+    whole runs is a handful of big-int operations done in C instead of per-address set work.
+    """
+
+    def __init__(self, addresses: Iterable[int]):
+        self.addresses = sorted(set(addresses))
+        self.positions = {addr: index for index, addr in enumerate(self.addresses)}
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def to_bitmap(self, addresses: Iterable[int]) -> int:
+        """Addresses outside the index are ignored."""
+        bits = bytearray((len(self.addresses) + 7) // 8)
+        for addr in addresses:
+            index = self.positions.get(addr)
+            if index is not None:
+                bits[index >> 3] |= 1 << (index & 7)
+        return int.from_bytes(bits, "little")
+
+    def from_bitmap(self, bitmap: int) -> list[int]:
+        addresses = []
+        bits = bitmap.to_bytes((len(self.addresses) + 7) // 8, "little")
+        for byte_index, byte in enumerate(bits):
+            # most bytes are empty, only look at the bits of the others
+            while byte:
+                low_bit = byte & -byte
+                addresses.append(self.addresses[(byte_index << 3) + low_bit.bit_length() - 1])
+                byte ^= low_bit
+        return addresses
+
+    def only_in(self, bitmap: int, other: int) -> int:
+        """The functions set in `bitmap` but not in `other`."""
+        return bitmap & ~other
@@ -1,7 +1,17 @@
-from dataclasses import dataclass
 from functools import cached_property
+from typing import Iterator, Optional
 import gdb
-import re
+import mmap
+import os
+import struct
+
+from call_graph import CALL_SITE_SIZE, find_call_sites
+from command_options import parse_finder_options
+from elf_reader import ElfFile, FunctionRange
+from function_cache import FunctionCache
+from parallel_scan import ChunkedScanner, DEFAULT_CHUNK_SIZE
+from proc_maps import ProcMappingEntry, mapping_table
+from signature_scanner import CONFIRM_WINDOW_SIZE, ScanStats, SignatureScanner
 
 try:
     import capstone
@@ -9,30 +19,6 @@ except ImportError:
     gdb.write("[!] Capstone not found in GDB’s Python. Try launching GDB with: `gdb -ex 'python sys.path.append(\"/path/to/python/site-packages\")'`\n", gdb.STDERR)
     raise
 
-@dataclass
-class ProcMappingEntry:
-    start_addr: int
-    end_addr: int
-    size: int
-    offset: int
-    perms: str
-    # some entries may not have a name
-    objfile: str = ""
-
-    def __post_init__(self):
-        # TODO: rewrite this ugly shit
-        if isinstance(self.start_addr, str):
-            self.start_addr = int(self.start_addr, 0)
-
-        if isinstance(self.end_addr, str):
-            self.end_addr = int(self.end_addr, 0)
-        
-        if isinstance(self.size, str):
-            self.size = int(self.size, 0)
-        
-        if isinstance(self.offset, str):
-            self.offset = int(self.offset, 0)
-
 DISASSEMBLERS: dict[str, capstone.Cs] = {
     "x86-64": capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_64),
     "i386": capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_32),
@@ -51,7 +37,26 @@ FUNCTIONS_STARTS: dict[str, list[int]] = {
     "mips64": [0x27, 0xbd, 0xff, 0xff],  # addiu
 }
 
+# Every byte sequence the scanner looks for, the plain prologue plus its CET (endbr) variant
+FUNCTIONS_SIGNATURES: dict[str, list[bytes]] = {
+    arch: [bytes(start)] for arch, start in FUNCTIONS_STARTS.items()
+}
+FUNCTIONS_SIGNATURES["x86-64"].append(bytes([0xf3, 0x0f, 0x1e, 0xfa] + FUNCTIONS_STARTS["x86-64"]))  # endbr64
+FUNCTIONS_SIGNATURES["i386"].append(bytes([0xf3, 0x0f, 0x1e, 0xfb] + FUNCTIONS_STARTS["i386"]))  # endbr32
+
+# Bytes compared between the inferior and the file before scanning the file instead
+FILE_BACKING_SAMPLE_SIZE: int = 64
+
 class FunctionFinder:
+    def __init__(self, use_cache: bool = True, jobs: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 objfile: str = None):
+        # the object to discover, the main binary by default (a shared library path otherwise)
+        self.objfile = objfile
+        self.scan_stats = ScanStats()
+        self.cache = FunctionCache() if use_cache else None
+        self.jobs = jobs
+        self.chunk_size = chunk_size
+
     @cached_property
     def inferior(self) -> gdb.Inferior:
         return gdb.selected_inferior()
@@ -62,37 +67,20 @@ class FunctionFinder:
 
     @cached_property
     def proc_name(self) -> str:
-        return self.inferior.progspace.filename
-
-    def get_mappings_columns(self, mappings: list[str]) -> list:
-        for entry in mappings:
-            entry = entry.strip()
-            if entry.startswith("Start Addr"):
-                # Use regex to extract the columns
-                return re.split(r'\s{2,}', entry)
-        return []
-
-    def parse_mappings(self, mappings: list[str], columns: list[str]) -> list[ProcMappingEntry]:
-        parsed_mappings = []
-        num_columns = len(columns)
-        for entry in mappings:
-            entry = entry.strip()
-            if entry.startswith("0x"):
-                tokens = re.split(r'\s{2,}', entry, maxsplit=num_columns-1)
-
-                # this will also validate the number of columns
-                parsed_entry = ProcMappingEntry(*tokens)
-                
-                if parsed_entry.objfile == self.proc_name:
-                    parsed_mappings.append(parsed_entry)
-
-        return parsed_mappings
-            
-
-    def get_proc_mappings(self) -> list[ProcMappingEntry]:     
-        mappings = gdb.execute("info proc mappings", to_string=True).splitlines()
-        columns = self.get_mappings_columns(mappings)
-        return self.parse_mappings(mappings, columns)
+        return self.objfile or self.inferior.progspace.filename
+
+    @cached_property
+    def real_proc_name(self) -> str:
+        # the mappings name the resolved file, gdb may have loaded it through a symlink
+        return os.path.realpath(self.proc_name)
+
+    def get_proc_mappings(self, all_objfiles: bool = False) -> list[ProcMappingEntry]:
+        """The binary's mappings, or every mapping (heap, stacks, libraries) with `all_objfiles`."""
+        mappings = mapping_table.get()
+        if all_objfiles:
+            return list(mappings)
+        names = (self.proc_name, self.real_proc_name)
+        return [mapping for mapping in mappings if mapping.objfile in names]
     
     def get_disassembler(self, arch: str) -> capstone.Cs:
         if disassembler := DISASSEMBLERS.get(arch.split(":")[-1]):
@@ -101,39 +89,106 @@ class FunctionFinder:
         raise NotImplementedError(f"Unsupported Capstone arch: {arch}")
 
 
-    def looks_like_function_start(self, insns, arch):
+    def get_scanner(self, arch: str) -> SignatureScanner:
+        if signatures := FUNCTIONS_SIGNATURES.get(arch.split(":")[-1]):
+            return SignatureScanner(signatures)
+        raise NotImplementedError(f"Unsupported prologue arch: {arch}")
+
+    def looks_like_function_start(self, insns, signature: bytes) -> bool:
         if not insns or len(insns) < 2:
             return False
 
-        # Get first 4 byte values from instruction bytes
-        first_bytes = []
+        # The signature has to decode into whole instructions, not end mid-instruction
+        decoded = b""
         for insn in insns:
-            first_bytes.extend(insn.bytes)
-            if len(first_bytes) >= 4:
+            decoded += bytes(insn.bytes)
+            if len(decoded) >= len(signature):
                 break
-        first_bytes = first_bytes[:4]
 
-        expected = FUNCTIONS_STARTS.get(arch.split(":")[-1])
-        if not expected:
+        return decoded == signature
+
+    def confirm_function_start(self, mem: bytes, offset: int, address: int, signature: bytes, md: capstone.Cs) -> bool:
+        code = mem[offset:offset + CONFIRM_WINDOW_SIZE]
+        try:
+            return self.looks_like_function_start(list(md.disasm(code, address)), signature)
+        except capstone.CsError:
             return False
 
-        return first_bytes == expected
-    
-    def find_function_starts(self, mem: bytes, base_addr: int, md: capstone.Cs) -> list[int]:
-        candidates = []
-        for offset in range(0, len(mem) - 16):  # scan with 1-byte granularity
-            try:
-                code = mem[offset:offset + 16]
-                insns = list(md.disasm(code, base_addr + offset))
-                if self.looks_like_function_start(insns, self.proc_arch):
-                    candidates.append(base_addr + offset)
-            except Exception:
+    def get_file_backing(self, mapping: ProcMappingEntry) -> Optional[int]:
+        """
+        How many of the mapping's bytes can be read from its file (from `mapping.offset`), or None
+        when the file is not local or no longer holds what the inferior mapped (rebuilt, deleted, remote).
+        The tail past the end of the file is zero filled, there's nothing to find there.
+        """
+        try:
+            file_size = os.path.getsize(mapping.objfile)
+            with open(mapping.objfile, "rb") as f:
+                f.seek(mapping.offset)
+                sample = f.read(min(FILE_BACKING_SAMPLE_SIZE, mapping.size))
+        except OSError:
+            return None
+        if not sample or bytes(self.inferior.read_memory(mapping.start_addr, len(sample))) != sample:
+            return None
+        return min(mapping.size, file_size - mapping.offset)
+
+    def scan_mapping(self, mapping: ProcMappingEntry, md: capstone.Cs) -> list[int]:
+        """
+        Scan one mapping chunk by chunk (over `self.jobs` worker processes), so only a few chunks
+        are ever held in memory. When the mapping's file is readable it is mapped and searched in
+        place instead of reading the inferior through gdb. Capstone confirms the hits here, in the gdb thread.
+        """
+        scanner = ChunkedScanner(self.get_scanner(self.proc_arch).signatures, self.jobs, self.chunk_size,
+                                 overlap=CONFIRM_WINDOW_SIZE - 1)
+
+        def confirm(chunk: bytes, offset: int, address: int, signature: bytes) -> bool:
+            return self.confirm_function_start(chunk, offset, address, signature, md)
+
+        if mapping.objfile and (file_size := self.get_file_backing(mapping)) is not None:
+            return scanner.scan_file(mapping.objfile, mapping.offset, mapping.start_addr, file_size,
+                                     confirm, self.scan_stats)
+        return scanner.scan(self.inferior.read_memory, mapping.start_addr, mapping.size, confirm, self.scan_stats)
+
+
+    def iter_call_sites(self) -> Iterator[tuple[int, int]]:
+        """
+        Yield `(site, target)` for the direct calls in the binary's text, for a `CallGraph`. The text
+        is read the way `scan_mapping` does, from the file when it matches, else through gdb.
+        """
+        # chunks bound what a read (or the aarch64 decoder) holds at once, no worker pool
+        chunker = ChunkedScanner([], 1, self.chunk_size, overlap=CALL_SITE_SIZE - 1)
+        for mapping in self.get_proc_mappings():
+            if mapping.perms != "r-xp":
                 continue
-        return sorted(candidates)
 
+            if mapping.objfile and (file_size := self.get_file_backing(mapping)) is not None:
+                base_addr = mapping.start_addr - mapping.offset
+                with open(mapping.objfile, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    for _, _, window_start, window_end in chunker.iter_windows(mapping.offset, file_size):
+                        yield from find_call_sites(self.proc_arch, buffer, window_start, window_end, base_addr)
+            else:
+                for chunk_base, chunk, scan_start, scan_end in chunker.iter_chunks(
+                        self.inferior.read_memory, mapping.start_addr, mapping.size):
+                    yield from find_call_sites(self.proc_arch, chunk, scan_start, scan_end, chunk_base)
 
-    def get_function_starts(self, mem: bytes, base_addr: int, md: capstone.Cs) -> list[int]:
-        return self.find_function_starts(mem, base_addr, md)
+    def get_elf_function_starts(self, load_base: int) -> Optional[set[int]]:
+        """
+        Read symbols, FDEs, init arrays and PLT stubs straight from the binary, in one pass and
+        without gdb round-trips. Returns None when the file is not available locally.
+        """
+        try:
+            with ElfFile(self.proc_name) as elf:
+                bias = elf.load_bias(load_base)
+                return {bias + addr for addr in elf.function_starts()}
+        except (OSError, ValueError, struct.error) as e:
+            print(f"[!] Could not read functions from {self.proc_name}: {e}")
+            return None
+
+    def get_function_ranges(self, load_base: int) -> list[FunctionRange]:
+        """Relocated function bounds from the symbol table and .eh_frame (exact even on stripped builds)."""
+        with ElfFile(self.proc_name) as elf:
+            bias = elf.load_bias(load_base)
+            return [FunctionRange(bias + function_range.start, function_range.size, function_range.name)
+                    for function_range in elf.function_ranges()]
 
     def get_all_function_symbols(self) -> set[int]:
         output = gdb.execute("info functions", to_string=True)
@@ -150,18 +205,56 @@ class FunctionFinder:
                     continue
         return symbols
 
+    def get_load_base(self, mappings: list[ProcMappingEntry]) -> int:
+        return min(mapping.start_addr for mapping in mappings)
+
+    def load_cached_addresses(self, load_base: int) -> Optional[set[int]]:
+        if self.cache is None or not os.path.isfile(self.proc_name):
+            return None
+
+        offsets = self.cache.load(self.proc_name, self.proc_arch)
+        if offsets is None:
+            return None
+
+        print(f"[*] Loaded {len(offsets)} function addresses from cache.")
+        return {load_base + offset for offset in offsets}
+
+    def store_cached_addresses(self, functions_addrs: set[int], load_base: int) -> None:
+        if self.cache is None or not os.path.isfile(self.proc_name):
+            return
+
+        try:
+            self.cache.store(self.proc_name, self.proc_arch, (addr - load_base for addr in functions_addrs))
+        except OSError as e:
+            print(f"[!] Could not write the functions cache: {e}")
+
     def get_functions_addresses(self) -> set[int]:
         mappings = self.get_proc_mappings()
+        if not mappings:
+            return set()
+
+        load_base = self.get_load_base(mappings)
+        if (cached := self.load_cached_addresses(load_base)) is not None:
+            return cached
+
         md = self.get_disassembler(self.proc_arch)
         
         functions_addrs = set()
+        self.scan_stats = ScanStats()
         # for non-symbols functions
         for mapping in mappings:
             if mapping.perms == "r-xp":
-                mem = gdb.selected_inferior().read_memory(mapping.start_addr, mapping.size)
-                functions_starts = self.get_function_starts(mem, mapping.start_addr, md)
-                functions_addrs.update(functions_starts)
+                functions_addrs.update(self.scan_mapping(mapping, md))
+        print(f"[*] Prologue scan: {self.scan_stats}")
+
+        symbols = self.get_elf_function_starts(load_base)
+        if symbols is None:
+            # the binary is not readable from here (e.g. remote target), ask gdb instead
+            symbols = self.get_all_function_symbols()
 
-        functions_addrs.update(self.get_all_function_symbols())
+        # `info functions` also lists shared libraries, only keep what is mapped from the binary
+        load_end = max(mapping.end_addr for mapping in mappings)
+        functions_addrs.update(addr for addr in symbols if load_base <= addr < load_end)
 
+        self.store_cached_addresses(functions_addrs, load_base)
         return functions_addrs
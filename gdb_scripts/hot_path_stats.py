@@ -0,0 +1,105 @@
+import json
+import os
+from typing import Optional, TextIO
+
+# bucket `i` holds the durations of `i` bits, i.e. in [2^(i-1), 2^i) ns
+HISTOGRAM_BUCKETS: int = 64
+
+
+class LatencyHistogram:
+    """Count, total, max and a log2 histogram of durations in ns, recording is a few integer operations."""
+    __slots__ = ("count", "total_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def record(self, ns: int) -> None:
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[min(ns.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def percentile(self, percent: float) -> int:
+        """Upper bound (in ns) of the bucket holding the percentile, exact to a factor of 2."""
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(1 << index, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ns": self.total_ns,
+            "max_ns": self.max_ns,
+            # only the used buckets, keyed by their upper bound
+            "buckets": {str(1 << index): count for index, count in enumerate(self.buckets) if count},
+        }
+
+
+class HotPathStats:
+    """
+    Per-phase latency histograms and plain counters for the stop handling hot path.
+    Cheap enough to stay on: a record is a dict lookup and a few integer operations on
+    `time.perf_counter_ns()` deltas, nothing is allocated per stop.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.phases: dict[str, LatencyHistogram] = {}
+        self.counters: dict[str, int] = {}
+
+    def record(self, phase: str, ns: int) -> None:
+        if not self.enabled:
+            return
+        histogram = self.phases.get(phase)
+        if histogram is None:
+            histogram = self.phases[phase] = LatencyHistogram()
+        histogram.record(ns)
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def reset(self) -> None:
+        self.phases.clear()
+        self.counters.clear()
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": {phase: histogram.to_dict() for phase, histogram in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+    def write_json(self, stream: TextIO) -> None:
+        json.dump(self.to_dict(), stream, indent=2)
+
+    def format(self) -> str:
+        lines = [f"{'phase':18} {'count':>9} {'total ms':>10} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'max us':>9}"]
+        for phase, histogram in sorted(self.phases.items()):
+            mean = histogram.total_ns / histogram.count if histogram.count else 0
+            lines.append(f"{phase:18} {histogram.count:9} {histogram.total_ns / 1e6:10.2f} {mean / 1e3:9.1f} "
+                         f"{histogram.percentile(50) / 1e3:9.1f} {histogram.percentile(99) / 1e3:9.1f} "
+                         f"{histogram.max_ns / 1e3:9.1f}")
+        for counter, value in sorted(self.counters.items()):
+            lines.append(f"{counter:18} {value}")
+        return "\n".join(lines)
+
+
+def read_process_cpu_ns(pid: int) -> Optional[int]:
+    """User + system CPU time of a process (all its threads) from /proc, None if it is gone."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # the command name may contain spaces, the fields start after its closing parenthesis
+    fields = stat[stat.rindex(")") + 2:].split()
+    ticks = int(fields[11]) + int(fields[12])  # utime, stime
+    return ticks * 1_000_000_000 // os.sysconf("SC_CLK_TCK")
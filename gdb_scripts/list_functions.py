@@ -5,17 +5,26 @@ import gdb
 # Add the directory containing this script to sys.path
 sys.path.append(os.path.dirname(__file__))
 
-from functions_finder import FunctionFinder
+from functions_finder import FunctionFinder, parse_finder_options
 
 
 class ListFunctions(gdb.Command):
-    """List potential function addresses in executable memory without relying on symbols."""
+    """List potential function addresses in executable memory without relying on symbols.
+    Usage: list_functions [--jobs N] [--chunk-size BYTES] [--no-cache]
+    """
 
     def __init__(self):
         super().__init__("list_functions", gdb.COMMAND_USER)
 
     def invoke(self, arg, from_tty):
-        finder = FunctionFinder()
+        args = gdb.string_to_argv(arg)
+        try:
+            # `--no-cache` forces a full rescan and skips the on-disk address cache
+            finder_options = parse_finder_options(args)
+        except ValueError as e:
+            print(f"[!] Bad option: {e}")
+            return
+        finder = FunctionFinder(**finder_options)
         addresses = finder.get_functions_addresses()
         print(f"[*] Functions addresses:")
         for addr in sorted(addresses):
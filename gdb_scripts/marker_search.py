@@ -0,0 +1,145 @@
+from typing import Iterable, Optional
+import gdb
+
+from proc_maps import ProcMappingEntry, mapping_table
+
+# bytes searched per stop by the background sweep, bounds the cost of a stop on huge heaps
+MARKER_SWEEP_BUDGET: int = 8 * 1024 * 1024
+# bytes searched behind every pointer-looking argument register
+MARKER_PROBE_WINDOW: int = 4096
+
+# where the first arguments are passed, the buffers a traced function gets are searched first
+ARGUMENT_REGISTERS: dict[str, list[str]] = {
+    "x86-64": ["rdi", "rsi", "rdx", "rcx", "r8", "r9"],
+    "i386": [],  # arguments are on the stack, only the sweep covers them
+    "arm": ["r0", "r1", "r2", "r3"],
+    "aarch64": [f"x{i}" for i in range(8)],
+    "mips": ["a0", "a1", "a2", "a3"],
+    "mips64": [f"a{i}" for i in range(8)],
+}
+
+
+class MarkerSearch:
+    """
+    Looks for a byte string in the inferior's writable memory, a little on every stop.
+    Each stop first searches behind the argument registers that point into writable memory
+    (the buffer a function is handed), then advances a sweep over all the writable mappings by
+    at most `sweep_budget` bytes, so a GB-sized heap is covered across many stops instead of
+    being read whole on each one. The searches run in gdb (`Inferior.search_memory`), the
+    memory is never copied into Python.
+    """
+
+    def __init__(self, marker: bytes, mappings: Iterable[ProcMappingEntry], arch: str,
+                 sweep_budget: int = MARKER_SWEEP_BUDGET, probe_window: int = MARKER_PROBE_WINDOW):
+        self.marker = marker
+        self.inferior = gdb.selected_inferior()
+        self.registers = ARGUMENT_REGISTERS.get(arch.split(":")[-1], [])
+        self.sweep_budget = sweep_budget
+        self.probe_window = probe_window
+        self.regions: list[tuple[int, int]] = []
+        self.set_regions(mappings)
+        # copies that were there before the trigger ran
+        self.baseline: set[int] = set()
+        # sweep cursor, the address the next sweep window starts at
+        self.sweep_region = 0
+        self.sweep_addr = self.regions[0][0] if self.regions else 0
+        self.bytes_searched = 0
+        self.found_addr: Optional[int] = None
+        # "probe" when an argument pointed at the marker, "sweep" when the sweep found it
+        self.found_by: Optional[str] = None
+
+    def set_regions(self, mappings: Iterable[ProcMappingEntry]) -> None:
+        self.regions = sorted((mapping.start_addr, mapping.end_addr) for mapping in mappings if "w" in mapping.perms)
+
+    def _region_end(self, addr: int) -> Optional[int]:
+        """End of the writable mapping holding `addr`, None outside of them."""
+        mapping = mapping_table.find(addr)
+        if mapping is None or "w" not in mapping.perms:
+            return None
+        return mapping.end_addr
+
+    def _search(self, start: int, length: int) -> Optional[int]:
+        """First new copy of the marker in `[start, start + length)`, copies from the baseline are skipped."""
+        end = start + length
+        while end - start >= len(self.marker):
+            try:
+                found = self.inferior.search_memory(start, end - start, self.marker)
+            except gdb.error:
+                # unmapped since the regions were listed
+                return None
+            if found is None:
+                self.bytes_searched += end - start
+                return None
+            self.bytes_searched += found + len(self.marker) - start
+            if found not in self.baseline:
+                return found
+            start = found + 1
+        return None
+
+    def record_baseline(self) -> int:
+        """Remember every copy already in memory, so only the ones the trigger writes are reported."""
+        for start, end in self.regions:
+            addr = start
+            while end - addr >= len(self.marker):
+                try:
+                    found = self.inferior.search_memory(addr, end - addr, self.marker)
+                except gdb.error:
+                    break
+                if found is None:
+                    break
+                self.baseline.add(found)
+                addr = found + 1
+        return len(self.baseline)
+
+    def probe_arguments(self, frame: gdb.Frame) -> Optional[int]:
+        for register in self.registers:
+            try:
+                addr = int(frame.read_register(register)) & ((1 << 64) - 1)
+            except (ValueError, gdb.error):
+                continue
+            region_end = self._region_end(addr)
+            if region_end is None:
+                continue
+            if (found := self._search(addr, min(self.probe_window, region_end - addr))) is not None:
+                return found
+        return None
+
+    def sweep(self) -> Optional[int]:
+        """Search the next `sweep_budget` bytes, wrapping around to the first region at the end."""
+        if not self.regions:
+            return None
+
+        budget = self.sweep_budget
+        # windows overlap by this much, so a marker across two of them is still found
+        overlap = len(self.marker) - 1
+        while budget > 0:
+            start, end = self.regions[self.sweep_region]
+            addr = max(self.sweep_addr, start)
+            length = min(budget, end - addr)
+            found = self._search(addr, length) if length > 0 else None
+            budget -= max(length, 1)
+
+            if addr + length >= end:
+                self.sweep_region = (self.sweep_region + 1) % len(self.regions)
+                self.sweep_addr = self.regions[self.sweep_region][0]
+            else:
+                self.sweep_addr = addr + length - overlap
+
+            if found is not None:
+                return found
+        return None
+
+    def check(self, frame: gdb.Frame) -> Optional[int]:
+        """Search on a stop, returns the marker's address the first time it is found."""
+        if self.found_addr is not None:
+            return None
+
+        if (found := self.probe_arguments(frame)) is not None:
+            self.found_by = "probe"
+        elif (found := self.sweep()) is not None:
+            self.found_by = "sweep"
+        else:
+            return None
+
+        self.found_addr = found
+        return found
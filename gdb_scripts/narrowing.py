@@ -0,0 +1,97 @@
+from typing import Callable, Optional
+
+# arms a group of functions, runs the trigger once and returns the members that were hit
+RoundRunner = Callable[[list[int]], set[int]]
+
+
+def split(group: list[int], parts: int) -> list[list[int]]:
+    """`group` cut into `parts` contiguous chunks whose sizes differ by one at most."""
+    size, extra = divmod(len(group), parts)
+    chunks = []
+    start = 0
+    for index in range(parts):
+        end = start + size + (index < extra)
+        chunks.append(group[start:end])
+        start = end
+    return chunks
+
+
+class BisectSearch:
+    """
+    Group testing over candidate functions. A round arms one group, and the group fires when the
+    trigger hits any of it. A firing group is cut in halves, each armed in its own round, and only the
+    halves that fire are kept, down to single functions. A group firing while neither half does holds
+    functions that only fire together (a timing dependent path, armed breakpoints interacting), delta
+    debugging then shrinks it to a minimal set that still fires.
+    With k functions firing on their own among n candidates it takes about 2k*log2(n/k) rounds.
+    """
+
+    def __init__(self, run_round: RoundRunner, max_rounds: Optional[int] = None):
+        self.run_round = run_round
+        self.max_rounds = max_rounds
+        # (armed, hit, candidates in play) per round
+        self.rounds: list[tuple[int, int, int]] = []
+        self.found: list[list[int]] = []
+        self.pending: list[list[int]] = []
+        self.current: list[int] = []
+        # groups that did not fire, the chunks tried by ddmin repeat some of them
+        self._quiet: set[tuple[int, ...]] = set()
+
+    @property
+    def candidates(self) -> int:
+        return sum(map(len, self.found)) + sum(map(len, self.pending)) + len(self.current)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.max_rounds is not None and len(self.rounds) >= self.max_rounds
+
+    def fires(self, group: list[int]) -> bool:
+        if tuple(group) in self._quiet:
+            return False
+        hits = self.run_round(group)
+        self.rounds.append((len(group), len(hits), self.candidates))
+        if not hits:
+            self._quiet.add(tuple(group))
+        return bool(hits)
+
+    def run(self, candidates: list[int]) -> list[list[int]]:
+        """
+        Narrow `candidates`, known to fire together (the hits of a round with everything armed).
+        Returns the single functions and the minimal sets that only fire together, plus the groups
+        left unsplit once `max_rounds` ran out.
+        """
+        self.pending = [sorted(candidates)] if candidates else []
+        while self.pending and not self.exhausted:
+            self.current = group = self.pending.pop()
+            if len(group) == 1:
+                self.found.append(group)
+            elif firing := [half for half in split(group, 2) if self.fires(half)]:
+                self.pending.extend(firing)
+            else:
+                self.found.append(self._ddmin(group))
+            self.current = []
+        return self.found + self.pending
+
+    def _ddmin(self, group: list[int]) -> list[int]:
+        """Zeller's ddmin, from 4 chunks since the halves of `group` were tested already."""
+        parts = 4
+        while len(group) > 1 and not self.exhausted:
+            parts = min(parts, len(group))
+            chunks = split(group, parts)
+            subset = next((chunk for chunk in chunks if self.fires(chunk)), None)
+            if subset is not None:
+                self.current = group = subset
+                parts = 2
+                continue
+            if parts > 2:
+                complements = ([addr for other, chunk in enumerate(chunks) if other != index for addr in chunk]
+                               for index in range(parts))
+                subset = next((complement for complement in complements if self.fires(complement)), None)
+                if subset is not None:
+                    self.current = group = subset
+                    parts = max(parts - 1, 2)
+                    continue
+            if parts == len(group):
+                break
+            parts = min(parts * 2, len(group))
+        return group
@@ -0,0 +1,165 @@
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+import mmap
+import multiprocessing
+import time
+from typing import Callable, Optional
+
+from signature_scanner import ScanStats, SignatureScanner
+
+DEFAULT_CHUNK_SIZE: int = 4 * 1024 * 1024
+# how many chunks each worker may have queued, bounds the memory held by the parent
+CHUNKS_IN_FLIGHT_PER_JOB: int = 2
+
+
+def scan_chunk(signatures: list[bytes], chunk: bytes, scan_start: int, scan_end: int) -> list[tuple[int, bytes]]:
+    """
+    Worker entry point: the `(offset, signature)` hits starting in `[scan_start, scan_end)`.
+    The bytes around that window are only context, so hits crossing the chunk edges resolve the same way.
+    """
+    return [(offset, signature)
+            for offset, signature in SignatureScanner(signatures).iter_candidates(chunk, 0, scan_end)
+            if offset >= scan_start]
+
+
+def scan_file_chunk(signatures: list[bytes], path: str, chunk_base: int, scan_start: int,
+                    scan_end: int) -> list[tuple[int, bytes]]:
+    """
+    Worker entry point for file backed ranges: the hits starting in `[scan_start, scan_end)` of the
+    file, read through the worker's own mapping of it so only offsets cross the process boundary.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return [(offset, signature)
+                for offset, signature in SignatureScanner(signatures).iter_candidates(buffer, chunk_base, scan_end)
+                if offset >= scan_start]
+
+
+class ChunkedScanner:
+    """
+    Scan a memory range in fixed size, overlapping chunks, optionally spread over worker processes.
+
+    Each chunk carries `overlap` extra bytes on both sides so that signatures (and the confirm window)
+    crossing a chunk boundary are still seen; hits are only reported by the chunk they start in, so
+    nothing is found twice. At most `jobs * CHUNKS_IN_FLIGHT_PER_JOB` chunks are alive at once, which bounds the
+    peak memory by the chunk size rather than the mapping size.
+    """
+
+    def __init__(self, signatures: list[bytes], jobs: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = 0):
+        self.signatures = signatures
+        self.jobs = max(1, jobs)
+        self.overlap = max(overlap, max((len(sig) for sig in signatures), default=0) - 1)
+        if chunk_size <= self.overlap:
+            raise ValueError(f"chunk size {chunk_size} is not larger than the {self.overlap} bytes overlap")
+        self.chunk_size = chunk_size
+
+    def _make_executor(self) -> Optional[Executor]:
+        if self.jobs == 1:
+            return None
+        # gdb's embedded interpreter can't be re-spawned as a plain python (`sys.executable` may be gdb
+        # itself), so `spawn` and `forkserver` are out and the workers are forked. gdb is multithreaded,
+        # forking it is safe here because the child only ever runs the forking thread's pure python byte
+        # search: it never calls back into gdb or touches a lock another gdb thread could have held at
+        # fork time (glibc's malloc and CPython's import lock and GIL are reset by their atfork handlers).
+        return ProcessPoolExecutor(max_workers=self.jobs, mp_context=multiprocessing.get_context("fork"))
+
+    def iter_windows(self, start: int, size: int):
+        """Yield `(chunk_base, chunk_end, window_start, window_end)`, chunks being windows plus the overlap."""
+        end = start + size
+        for window_start in range(start, end, self.chunk_size):
+            window_end = min(window_start + self.chunk_size, end)
+            yield max(start, window_start - self.overlap), min(end, window_end + self.overlap), window_start, window_end
+
+    def iter_chunks(self, read_memory: Callable[[int, int], bytes], start: int, size: int):
+        """Yield `(chunk_base, chunk, scan_start, scan_end)`, the scan window being relative to `chunk_base`."""
+        for chunk_base, chunk_end, window_start, window_end in self.iter_windows(start, size):
+            # one copy per chunk, the byte search needs `find` which gdb.Membuf doesn't have
+            chunk = bytes(read_memory(chunk_base, chunk_end - chunk_base))
+            yield chunk_base, chunk, window_start - chunk_base, window_end - chunk_base
+
+    def scan(self, read_memory: Callable[[int, int], bytes], start: int, size: int,
+             confirm: Optional[Callable[[bytes, int, int, bytes], bool]] = None,
+             stats: Optional[ScanStats] = None) -> list[int]:
+        """
+        Return the sorted addresses of the hits in `[start, start + size)`.
+        `read_memory(addr, length)` provides the bytes, `confirm(chunk, offset, address, signature)` may reject hits.
+        """
+        start_time = time.perf_counter()
+        candidates = 0
+        addresses = []
+
+        def collect(chunk_start: int, chunk: bytes, hits: list[tuple[int, bytes]]) -> None:
+            nonlocal candidates
+            candidates += len(hits)
+            for offset, signature in hits:
+                if confirm is None or confirm(chunk, offset, chunk_start + offset, signature):
+                    addresses.append(chunk_start + offset)
+
+        executor = self._make_executor()
+        try:
+            if executor is None:
+                for chunk_start, chunk, scan_start, scan_end in self.iter_chunks(read_memory, start, size):
+                    collect(chunk_start, chunk, scan_chunk(self.signatures, chunk, scan_start, scan_end))
+            else:
+                in_flight = deque()
+                for chunk_start, chunk, scan_start, scan_end in self.iter_chunks(read_memory, start, size):
+                    future = executor.submit(scan_chunk, self.signatures, chunk, scan_start, scan_end)
+                    in_flight.append((chunk_start, chunk, future))
+                    if len(in_flight) >= self.jobs * CHUNKS_IN_FLIGHT_PER_JOB:
+                        chunk_start, chunk, future = in_flight.popleft()
+                        collect(chunk_start, chunk, future.result())
+                while in_flight:
+                    chunk_start, chunk, future = in_flight.popleft()
+                    collect(chunk_start, chunk, future.result())
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if stats is not None:
+            stats.update(ScanStats(bytes_scanned=size, seconds=time.perf_counter() - start_time,
+                                   candidates=candidates, confirmed=len(addresses)))
+        return sorted(set(addresses))
+
+    def scan_file(self, path: str, file_offset: int, address: int, size: int,
+                  confirm: Optional[Callable[[bytes, int, int, bytes], bool]] = None,
+                  stats: Optional[ScanStats] = None) -> list[int]:
+        """
+        Like `scan`, for a range whose bytes are `size` bytes of `path` from `file_offset`, loaded at
+        `address`. The file is mapped and searched in place, no byte goes through gdb or gets copied;
+        `confirm` gets the mapping itself as the chunk and file offsets.
+        """
+        start_time = time.perf_counter()
+        candidates = 0
+        addresses = []
+
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            def collect(hits: list[tuple[int, bytes]]) -> None:
+                nonlocal candidates
+                candidates += len(hits)
+                for offset, signature in hits:
+                    hit_address = address + offset - file_offset
+                    if confirm is None or confirm(buffer, offset, hit_address, signature):
+                        addresses.append(hit_address)
+
+            executor = self._make_executor()
+            try:
+                if executor is None:
+                    # the whole range at once, the page cache holds the bytes
+                    end = file_offset + size
+                    collect(list(SignatureScanner(self.signatures).iter_candidates(buffer, file_offset, end)))
+                else:
+                    in_flight = deque()
+                    for chunk_base, _, window_start, window_end in self.iter_windows(file_offset, size):
+                        in_flight.append(executor.submit(scan_file_chunk, self.signatures, path,
+                                                         chunk_base, window_start, window_end))
+                        if len(in_flight) >= self.jobs * CHUNKS_IN_FLIGHT_PER_JOB:
+                            collect(in_flight.popleft().result())
+                    while in_flight:
+                        collect(in_flight.popleft().result())
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+
+        if stats is not None:
+            stats.update(ScanStats(bytes_scanned=size, seconds=time.perf_counter() - start_time,
+                                   candidates=candidates, confirmed=len(addresses)))
+        return sorted(set(addresses))
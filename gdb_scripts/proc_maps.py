@@ -0,0 +1,116 @@
+from bisect import bisect_right
+import os
+import re
+from typing import NamedTuple, Optional
+import gdb
+
+
+class ProcMappingEntry(NamedTuple):
+    start_addr: int
+    end_addr: int
+    size: int
+    offset: int
+    perms: str
+    # some entries may not have a name
+    objfile: str = ""
+
+
+def parse_proc_maps(text: str) -> list[ProcMappingEntry]:
+    """Parse `/proc/<pid>/maps`: `start-end perms offset dev inode [path]`."""
+    entries = []
+    for line in text.splitlines():
+        fields = line.split(maxsplit=5)
+        if len(fields) < 5:
+            continue
+        start, _, end = fields[0].partition("-")
+        start, end = int(start, 16), int(end, 16)
+        entries.append(ProcMappingEntry(start, end, end - start, int(fields[2], 16), fields[1],
+                                        fields[5] if len(fields) > 5 else ""))
+    return entries
+
+
+def parse_info_proc_mappings(text: str) -> list[ProcMappingEntry]:
+    """Parse the output of `info proc mappings`, for targets whose /proc is not ours (remote)."""
+    lines = text.splitlines()
+    columns = next((re.split(r'\s{2,}', line.strip()) for line in lines if line.strip().startswith("Start Addr")), [])
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if line.startswith("0x"):
+            tokens = re.split(r'\s{2,}', line, maxsplit=len(columns) - 1)
+            start, end, size, offset = (int(token, 0) for token in tokens[:4])
+            entries.append(ProcMappingEntry(start, end, size, offset, *tokens[4:]))
+    return entries
+
+
+class MappingTable:
+    """
+    The inferior's memory map, parsed once and kept until something remaps memory: a library
+    loaded or unloaded (which also covers exec), the process exiting or being re-run, or a stop
+    on a catchpoint (`catch syscall mmap munmap mremap brk`, `catch exec`, `catch load`).
+    Local inferiors are read from `/proc/<pid>/maps`, `info proc mappings` is the fallback.
+    Sorted by start address, `find` is a bisect.
+    """
+
+    def __init__(self):
+        self.entries: Optional[list[ProcMappingEntry]] = None
+        self.starts: list[int] = []
+        self.pid = 0
+        # parses of the map, shown by `break_on_functions stats`
+        self.reads = 0
+        # gdb 13+, without it only the objfile and exit events invalidate
+        self._catchpoint_type = getattr(gdb, "BP_CATCHPOINT", None)
+
+        # connected at import, before the consumers' own handlers, which then see the new layout
+        gdb.events.new_objfile.connect(self.invalidate)
+        gdb.events.exited.connect(self.invalidate)
+        gdb.events.stop.connect(self._on_stop)
+        # gdb 13+
+        if hasattr(gdb.events, "free_objfile"):
+            gdb.events.free_objfile.connect(self.invalidate)
+
+    def invalidate(self, event=None) -> None:
+        self.entries = None
+
+    def _on_stop(self, event) -> None:
+        # runs on every stop, so it only looks at the first breakpoint
+        if self._catchpoint_type is not None and isinstance(event, gdb.BreakpointEvent) and \
+                event.breakpoint.type == self._catchpoint_type:
+            self.invalidate()
+
+    def _is_local(self, inferior: gdb.Inferior) -> bool:
+        # gdb 11+ tells the target type, older ones are trusted when the pid's /proc exists
+        connection = getattr(inferior, "connection", None)
+        if connection is not None and connection.type != "native":
+            return False
+        return os.path.exists(f"/proc/{inferior.pid}/maps")
+
+    def _read(self, inferior: gdb.Inferior) -> list[ProcMappingEntry]:
+        self.reads += 1
+        if self._is_local(inferior):
+            try:
+                with open(f"/proc/{inferior.pid}/maps") as f:
+                    return parse_proc_maps(f.read())
+            except OSError:
+                pass
+        return parse_info_proc_mappings(gdb.execute("info proc mappings", to_string=True))
+
+    def get(self) -> list[ProcMappingEntry]:
+        inferior = gdb.selected_inferior()
+        if self.entries is None or inferior.pid != self.pid:
+            self.pid = inferior.pid
+            self.entries = sorted(self._read(inferior)) if self.pid else []
+            self.starts = [entry.start_addr for entry in self.entries]
+        return self.entries
+
+    def find(self, addr: int) -> Optional[ProcMappingEntry]:
+        """The mapping holding `addr`, or None."""
+        entries = self.get()
+        index = bisect_right(self.starts, addr) - 1
+        if index >= 0 and addr < entries[index].end_addr:
+            return entries[index]
+        return None
+
+
+# shared by every finder, so the table is read once per memory layout
+mapping_table = MappingTable()
@@ -1,45 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
 import gdb
 import os
+import sys
+import time
+from types import CodeType
+
+# Add the directory containing this script to sys.path
+sys.path.append(os.path.dirname(__file__))
+
+from command_options import parse_load_options
+
+# percentiles reported by the load mode
+LATENCY_PERCENTILES: tuple = (50, 90, 99)
+
+def format_latencies(latencies: list[float]) -> str:
+    ordered = sorted(latencies)
+    parts = [f"min={ordered[0] * 1000:.2f}ms"]
+    for percentile in LATENCY_PERCENTILES:
+        index = min(len(ordered) - 1, len(ordered) * percentile // 100)
+        parts.append(f"p{percentile}={ordered[index] * 1000:.2f}ms")
+    parts.append(f"max={ordered[-1] * 1000:.2f}ms")
+    return " ".join(parts)
 
 class RunTrigger(gdb.Command):
     """Run an external Python script inside GDB.
-    Usage: run_trigger /full/path/to/script.py
+    Usage: run_trigger [--concurrency N] [--repeat M] /full/path/to/script.py
     """
 
     def __init__(self):
+        # path -> (mtime_ns, code), a trigger is only recompiled when its file changes
+        self.compiled: dict[str, tuple[int, CodeType]] = {}
         super().__init__("run_trigger", gdb.COMMAND_USER)
 
+    def compile_script(self, script_path: str) -> CodeType:
+        mtime_ns = os.stat(script_path).st_mtime_ns
+        cached = self.compiled.get(script_path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        with open(script_path, "r") as f:
+            code = compile(f.read(), script_path, "exec")
+        self.compiled[script_path] = (mtime_ns, code)
+        return code
+
+    def execute(self, code: CodeType, script_path: str) -> None:
+        # Define a custom execution context, fresh for every run
+        exec_globals = {
+            "__name__": "__main__",
+            "__file__": script_path,
+            "gdb": gdb  # Inject gdb into the script's namespace
+        }
+        exec(code, exec_globals)
+
     def run_script(self, script_path) -> None:
         if not os.path.isfile(script_path):
             print(f"[!] File not found: {script_path}")
             return
 
         try:
-            with open(script_path, "r") as f:
-                script_content = f.read()
-
-            # Define a custom execution context
-            exec_globals = {
-                "__name__": "__main__",
-                "__file__": script_path,
-                "gdb": gdb  # Inject gdb into the script's namespace
-            }
+            code = self.compile_script(script_path)
 
             print(f"[*] Running script: {script_path}")
-            exec(script_content, exec_globals)
+            self.execute(code, script_path)
             print("[+] Script finished.")
         except Exception as e:
             print(f"[!] Error while executing script: {e}")
 
+    def run_load(self, script_path: str, concurrency: int = 1, repeat: int = 1) -> list[float]:
+        """
+        Run the trigger `repeat` times with at most `concurrency` runs in flight (a thread pool,
+        the triggers are I/O bound), and report the latency of every run.
+        """
+        if not os.path.isfile(script_path):
+            print(f"[!] File not found: {script_path}")
+            return []
+
+        try:
+            code = self.compile_script(script_path)
+        except Exception as e:
+            print(f"[!] Error while compiling script: {e}")
+            return []
+
+        def timed_run(_) -> tuple[float, Exception]:
+            started = time.perf_counter()
+            try:
+                self.execute(code, script_path)
+                return time.perf_counter() - started, None
+            except Exception as e:
+                return time.perf_counter() - started, e
+
+        print(f"[*] Running script: {script_path} x{repeat}, {concurrency} concurrent")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed_run, range(repeat)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for latency, error in results if error is None]
+        errors = [error for _, error in results if error is not None]
+        print(f"[+] {len(latencies)}/{repeat} runs succeeded in {elapsed:.2f}s ({repeat / elapsed:.1f} runs/s)")
+        if latencies:
+            print(f"[*] Latency: {format_latencies(latencies)}")
+        if errors:
+            print(f"[!] {len(errors)} runs failed, first error: {errors[0]}")
+        return latencies
+
+    def run(self, script_path: str, concurrency: int = 1, repeat: int = 1) -> None:
+        """A single plain run, or the load mode when more than one run is asked for."""
+        if concurrency == 1 and repeat == 1:
+            self.run_script(script_path)
+        else:
+            self.run_load(script_path, concurrency, repeat)
+
     def invoke(self, arg, from_tty):
         args = gdb.string_to_argv(arg)
 
         if not args:
-            print("[!] Usage: run_trigger /path/to/script.py")
+            print("[!] Usage: run_trigger [--concurrency N] [--repeat M] /path/to/script.py")
+            return
+
+        try:
+            options = parse_load_options(args[:-1])
+        except ValueError as e:
+            print(f"[!] Bad option: {e}")
             return
 
-        script_path = args[0]
-        self.run_script(script_path)
+        script_path = args[-1]
+        self.run(script_path, **options)
 
 
 # Register the command
@@ -0,0 +1,151 @@
+from collections import Counter
+import threading
+import time
+from typing import Optional
+import gdb
+
+from call_node import CallNode
+from symbolizer import Symbolizer
+
+DEFAULT_SAMPLE_HZ: float = 50.0
+# frames deeper than this are dropped, bounds the cost of one sample
+MAX_SAMPLE_DEPTH: int = 64
+TOP_FUNCTIONS_AMOUNT: int = 20
+
+
+class SamplingProfiler:
+    """
+    Periodically interrupt the inferior, record the stack of every thread and resume it.
+    The cost is bounded by the sample rate instead of the call rate, no breakpoint is armed.
+    """
+
+    def __init__(self, hz: float = DEFAULT_SAMPLE_HZ, symbolizer: Optional[Symbolizer] = None):
+        if not hz > 0:
+            raise ValueError(f"the sample rate must be positive, got {hz}")
+        self.interval = 1.0 / hz
+        # resolves pcs with a bisect instead of a gdb symbol lookup, when given
+        self.symbolizer = symbolizer
+        self.done = threading.Event()
+        self.samples = 0
+        self.elapsed = 0.0
+        self.self_hits = Counter()  # function address -> samples where it was on top of the stack
+        self.total_hits = Counter()  # function address -> samples where it was anywhere on the stack
+        self.names: dict[int, str] = {}
+        self.root_calls: dict[int, CallNode] = {}
+        # pc -> (name, function address), symbol lookups are the expensive part of a sample
+        self._frame_cache: dict[int, tuple[str, int]] = {}
+
+    def _resolve(self, frame: gdb.Frame) -> tuple[str, int]:
+        pc = frame.pc()
+        if self.symbolizer is not None:
+            return self.symbolizer.lookup(pc)
+        if cached := self._frame_cache.get(pc):
+            return cached
+
+        function = frame.function()
+        if function is not None:
+            resolved = (function.print_name, int(function.value().address))
+        else:
+            resolved = (frame.name() or "unknown", pc)
+        self._frame_cache[pc] = resolved
+        return resolved
+
+    def _unwind(self) -> list[tuple[str, int]]:
+        stack = []
+        frame = gdb.newest_frame()
+        while frame is not None and len(stack) < MAX_SAMPLE_DEPTH:
+            stack.append(self._resolve(frame))
+            frame = frame.older()
+        stack.reverse()
+        return stack
+
+    def _add_stack(self, stack: list[tuple[str, int]]) -> None:
+        if not stack:
+            return
+
+        node = None
+        for name, addr in stack:
+            self.names[addr] = name
+            if node is None:
+                node = self.root_calls.get(addr) or self.root_calls.setdefault(addr, CallNode(name, addr))
+            else:
+                node = node.child(name, addr)
+            node.total_hits += 1
+        node.self_hits += 1
+
+        for addr in {addr for _, addr in stack}:
+            self.total_hits[addr] += 1
+        self.self_hits[stack[-1][1]] += 1
+
+    def take_sample(self) -> None:
+        selected = gdb.selected_thread()
+        try:
+            for thread in gdb.selected_inferior().threads():
+                if not thread.is_valid() or thread.is_exited():
+                    continue
+                thread.switch()
+                try:
+                    self._add_stack(self._unwind())
+                except gdb.error:
+                    # the unwinder can fail in the middle of prologues and syscalls
+                    continue
+        finally:
+            if selected is not None and selected.is_valid():
+                selected.switch()
+        self.samples += 1
+
+    def _interrupt(self) -> None:
+        try:
+            gdb.execute("interrupt", to_string=True)
+        except gdb.error:
+            # the inferior already stopped
+            pass
+
+    def _tick(self, duration: Optional[float]) -> None:
+        """Runs outside the gdb thread, asks it to interrupt the inferior at the sample rate."""
+        deadline = time.monotonic() + duration if duration else None
+        while not self.done.wait(self.interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                self.done.set()
+                break
+            gdb.post_event(self._interrupt)
+        # wakes the gdb thread up one last time so it notices we are done
+        gdb.post_event(self._interrupt)
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """
+        Sample until `done` is set (or `duration` seconds passed). Must run on the gdb thread: it
+        drives the inferior with plain `continue`s, and each interrupt returns here to take a sample.
+        """
+        self.done.clear()
+        ticker = threading.Thread(target=self._tick, args=(duration,), daemon=True)
+        start_time = time.perf_counter()
+        ticker.start()
+
+        while not self.done.is_set():
+            try:
+                gdb.execute("continue", to_string=True)
+            except gdb.error as e:
+                print(f"[!] Inferior can't be resumed: {e}")
+                self.done.set()
+                break
+            if not self.done.is_set():
+                self.take_sample()
+
+        self.elapsed = time.perf_counter() - start_time
+        ticker.join()
+
+    def print_profile(self, top: int = TOP_FUNCTIONS_AMOUNT) -> None:
+        rate = self.samples / self.elapsed if self.elapsed else 0.0
+        print(f"[*] {self.samples} samples in {self.elapsed:.2f}s ({rate:.1f} samples/s)")
+        if not self.samples:
+            return
+
+        print(f"[*] Hottest functions (self / total):")
+        for addr, hits in self.self_hits.most_common(top):
+            print(f"- {self.names[addr]:30} @ 0x{addr:x} | {100 * hits / self.samples:5.1f}% "
+                  f"/ {100 * self.total_hits[addr] / self.samples:5.1f}%")
+
+        print("[*] Sampled call tree:")
+        for root in self.root_calls.values():
+            root.print_tree()
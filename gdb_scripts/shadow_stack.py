@@ -0,0 +1,99 @@
+from typing import Callable, Optional
+import gdb
+
+from call_node import CallNode
+
+
+class ReturnTracker(gdb.FinishBreakpoint):
+    """Pops the shadow stack back to `depth` when the traced call returns, without stopping the inferior."""
+
+    def __init__(self, frame: gdb.Frame, owner: "ShadowCallStacks", thread: int, depth: int):
+        super().__init__(frame, internal=True)
+        self.silent = True
+        self.owner = owner
+        self.thread = thread
+        self.depth = depth
+        self.done = False
+
+    def _unwind(self) -> None:
+        if self.done:
+            return
+        self.done = True
+        self.owner.pop_to(self.thread, self.depth, returned=True)
+        self.owner.trackers.discard(self)
+        # a breakpoint can't be deleted from its own stop method
+        gdb.post_event(self._delete)
+
+    def _delete(self) -> None:
+        if self.is_valid():
+            self.delete()
+
+    def stop(self) -> bool:
+        self._unwind()
+        return False
+
+    def out_of_scope(self) -> None:
+        # longjmp, exceptions or a thread exit skipped the return
+        self._unwind()
+
+
+class ShadowCallStacks:
+    """
+    Per-thread shadow call stacks, kept in sync with function entries (pushed by the caller) and
+    returns (popped by a `ReturnTracker`). Each entry adds one edge to its thread's call tree,
+    the real stack is never unwound.
+    """
+
+    def __init__(self, on_return: Optional[Callable[[int], None]] = None):
+        self.on_return = on_return  # called with the entry address of every function that returns
+        self.stacks: dict[int, list[CallNode]] = {}
+        # thread number -> roots of that thread's call tree
+        self.root_calls: dict[int, dict[int, CallNode]] = {}
+        self.trackers: set[ReturnTracker] = set()
+
+    def enter(self, frame: gdb.Frame, name: str, addr: int) -> CallNode:
+        thread = gdb.selected_thread().num
+        stack = self.stacks.setdefault(thread, [])
+        depth = len(stack)
+
+        if stack:
+            node = stack[-1].child(name, addr)
+        else:
+            roots = self.root_calls.setdefault(thread, {})
+            node = roots.get(addr) or roots.setdefault(addr, CallNode(name, addr))
+        node.calls += 1
+        stack.append(node)
+
+        try:
+            self.trackers.add(ReturnTracker(frame, self, thread, depth))
+        except (ValueError, gdb.error):
+            # no caller frame to return to (e.g. the thread entry point), it stays on the stack
+            pass
+        return node
+
+    def pop_to(self, thread: int, depth: int, returned: bool = False) -> None:
+        stack = self.stacks.get(thread)
+        if stack is None or len(stack) <= depth:
+            return
+        if returned and self.on_return is not None:
+            self.on_return(stack[depth].addr)
+        del stack[depth:]
+
+    def merged_roots(self) -> list[CallNode]:
+        """The whole process view: the threads' trees merged by root function (copies, shards are untouched)."""
+        merged: dict[int, CallNode] = {}
+        for roots in self.root_calls.values():
+            for addr, root in roots.items():
+                target = merged.get(addr)
+                if target is None:
+                    target = merged[addr] = CallNode(root.name, addr)
+                target.merge(root)
+        return list(merged.values())
+
+    def clear(self) -> None:
+        """Delete the return breakpoints still pending, the tree is kept."""
+        for tracker in self.trackers:
+            if tracker.is_valid():
+                tracker.delete()
+        self.trackers.clear()
+        self.stacks.clear()
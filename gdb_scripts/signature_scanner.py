@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+import heapq
+import re
+import time
+from typing import Callable, Iterator, Optional
+
+# Enough bytes to decode any of the prologue signatures, hits are confirmed over this window
+CONFIRM_WINDOW_SIZE: int = 16
+
+@dataclass
+class ScanStats:
+    bytes_scanned: int = 0
+    seconds: float = 0.0
+    candidates: int = 0
+    confirmed: int = 0
+
+    @property
+    def mb_per_sec(self) -> float:
+        if not self.seconds:
+            return 0.0
+        return self.bytes_scanned / (1024 * 1024) / self.seconds
+
+    def update(self, other: "ScanStats") -> None:
+        self.bytes_scanned += other.bytes_scanned
+        self.seconds += other.seconds
+        self.candidates += other.candidates
+        self.confirmed += other.confirmed
+
+    def __str__(self) -> str:
+        return (f"{self.bytes_scanned / (1024 * 1024):.2f} MB in {self.seconds:.3f}s "
+                f"({self.mb_per_sec:.1f} MB/s), {self.candidates} candidates, {self.confirmed} confirmed")
+
+
+class SignatureScanner:
+    """
+    Find every offset where one of the given byte signatures starts.
+
+    Each signature is searched with `find` (memchr/two-way in C), which keeps the scan linear in the
+    buffer size and only surfaces the few hits to Python. Buffers without a `find` method (memoryview,
+    gdb.Membuf) go through a single compiled regex alternation instead.
+    """
+
+    def __init__(self, signatures: list[bytes]):
+        if not signatures:
+            raise ValueError("At least one signature is required")
+        self.signatures = sorted(set(signatures), key=len, reverse=True)
+        self.max_signature_len = len(self.signatures[0])
+        alternation = b"|".join(re.escape(sig) for sig in self.signatures)
+        self.pattern = re.compile(b"(?=(" + alternation + b"))", re.DOTALL)
+
+    def _find_all(self, mem, signature: bytes, start: int, end: int) -> Iterator[tuple[int, bytes]]:
+        offset = mem.find(signature, start, end + len(signature) - 1)
+        while offset != -1 and offset < end:
+            yield offset, signature
+            offset = mem.find(signature, offset + 1, end + len(signature) - 1)
+
+    def iter_candidates(self, mem, start: int = 0, end: Optional[int] = None) -> Iterator[tuple[int, bytes]]:
+        """
+        Yield `(offset, signature)` in offset order for every signature hit starting in `mem[start:end]`.
+        A hit nested inside a longer hit (e.g. the push after an endbr64) is reported only once.
+        """
+        if end is None:
+            end = len(mem)
+
+        if hasattr(mem, "find"):
+            hits = heapq.merge(*(self._find_all(mem, sig, start, end) for sig in self.signatures),
+                               key=lambda hit: (hit[0], -len(hit[1])))
+        else:
+            hits = ((match.start(), match.group(1))
+                    for match in self.pattern.finditer(mem, start, end + self.max_signature_len - 1))
+
+        covered_until = start
+        for offset, signature in hits:
+            if offset >= end:
+                break
+            if offset < covered_until:
+                continue
+            covered_until = offset + len(signature)
+            yield offset, signature
+
+    def scan(self, mem, base_addr: int, confirm: Optional[Callable[[int, bytes], bool]] = None,
+             stats: Optional[ScanStats] = None) -> list[int]:
+        """
+        Return the sorted addresses of all signature hits in `mem`.
+        `confirm(offset, signature)` is only called on hits and may reject them.
+        """
+        start_time = time.perf_counter()
+        candidates = 0
+        addresses = []
+        for offset, signature in self.iter_candidates(mem):
+            candidates += 1
+            if confirm is None or confirm(offset, signature):
+                addresses.append(base_addr + offset)
+
+        if stats is not None:
+            stats.update(ScanStats(bytes_scanned=len(mem), seconds=time.perf_counter() - start_time,
+                                   candidates=candidates, confirmed=len(addresses)))
+        return addresses
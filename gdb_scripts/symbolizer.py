@@ -0,0 +1,110 @@
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Iterable
+import gdb
+
+from call_node import CallNode
+from elf_reader import FunctionRange
+from proc_maps import mapping_table
+
+# distinct pcs kept resolved, the sampler sees far more pcs than there are functions
+LOOKUP_CACHE_SIZE: int = 1 << 16
+STRIPPED_NAME: str = "<stripped>"
+
+
+class Symbolizer:
+    """
+    Address -> (name, function start) over a sorted index of the binary's functions, built once
+    from the ELF symbols and FDEs plus the discovered starts. A lookup is a bisect, behind an LRU
+    cache; pcs outside the index (shared libraries) ask gdb once and stay cached.
+    An unsized start covers up to the next start, but never past the executable mapping it is in,
+    so pcs in another object's code or data are not named after the last function before them.
+    The stop handlers only record integer pcs, names are resolved when a report is printed.
+    """
+
+    def __init__(self, ranges: Iterable[FunctionRange], cache_size: int = LOOKUP_CACHE_SIZE):
+        self._by_start: dict[int, FunctionRange] = {}
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+        self.add(ranges)
+
+    def add(self, ranges: Iterable[FunctionRange]) -> None:
+        """Index more functions (e.g. a library loaded later), the lookup cache starts over."""
+        by_start = self._by_start
+        for function_range in ranges:
+            existing = by_start.get(function_range.start)
+            # a named (or sized) range wins over a bare discovered start
+            if existing is None or (not existing.name and function_range.name) or \
+                    (not existing.size and function_range.size and existing.name == function_range.name):
+                by_start[function_range.start] = function_range
+
+        self.starts = sorted(by_start)
+        self.sizes = [by_start[start].size for start in self.starts]
+        self.names = [by_start[start].name for start in self.starts]
+        self.ends = [self._range_end(index) for index in range(len(self.starts))]
+        self.lookup.cache_clear()
+
+    def _range_end(self, index: int) -> int:
+        start, size = self.starts[index], self.sizes[index]
+        if size:
+            return start + size
+        # up to the next start, within the executable mapping holding the start
+        mapping = mapping_table.find(start)
+        text_end = mapping.end_addr if mapping is not None and "x" in mapping.perms else None
+        next_start = self.starts[index + 1] if index + 1 < len(self.starts) else None
+        if text_end is None:
+            # no mapping known, an unsized last start only covers its own address
+            return next_start if next_start is not None else start + 1
+        return min(text_end, next_start) if next_start is not None else text_end
+
+    @classmethod
+    def from_finder(cls, finder, addresses: Iterable[int]) -> "Symbolizer":
+        """Index the binary `finder` looked at, `addresses` are its discovered function starts."""
+        return cls(cls.ranges_from_finder(finder, addresses))
+
+    def add_finder(self, finder, addresses: Iterable[int]) -> None:
+        """Index one more object, see `from_finder`."""
+        self.add(self.ranges_from_finder(finder, addresses))
+
+    @staticmethod
+    def ranges_from_finder(finder, addresses: Iterable[int]) -> list[FunctionRange]:
+        ranges = [FunctionRange(addr, 0) for addr in addresses]
+        mappings = finder.get_proc_mappings()
+        if mappings:
+            try:
+                ranges.extend(finder.get_function_ranges(finder.get_load_base(mappings)))
+            except (OSError, ValueError):
+                # not readable from here, gdb answers the lookups instead
+                pass
+        return ranges
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _lookup(self, pc: int) -> tuple[str, int]:
+        index = bisect_right(self.starts, pc) - 1
+        if index >= 0 and pc < self.ends[index]:
+            return self.names[index] or STRIPPED_NAME, self.starts[index]
+        return self._gdb_lookup(pc)
+
+    def _gdb_lookup(self, pc: int) -> tuple[str, int]:
+        """`info symbol` also knows the minimal symbols of the shared libraries, the bare pc otherwise."""
+        try:
+            text = gdb.execute(f"info symbol 0x{pc:x}", to_string=True).strip()
+        except gdb.error:
+            return f"0x{pc:x}", pc
+        if text.startswith("No symbol"):
+            return f"0x{pc:x}", pc
+
+        symbol = text.split(" in section ")[0]
+        name, _, offset = symbol.partition(" + ")
+        return name, pc - int(offset or "0")
+
+    def name(self, pc: int) -> str:
+        return self.lookup(pc)[0]
+
+    def fill_names(self, roots: Iterable[CallNode]) -> None:
+        """Name the nodes of call trees recorded with raw pcs only."""
+        for root in roots:
+            for _, node in root.walk():
+                if node.name is None:
+                    node.name = self.name(node.addr)
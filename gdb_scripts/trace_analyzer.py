@@ -0,0 +1,126 @@
+"""
+Offline analysis of the trace logs written by `break_on_functions log <path>`, runs without gdb.
+Usage: python trace_analyzer.py <trace.bin> [--counts] [--tree] [--timeline] [--binary PATH --load-base ADDR]
+"""
+import argparse
+from bisect import bisect_right
+from collections import Counter, defaultdict
+import os
+import sys
+
+# Add the directory containing this script to sys.path
+sys.path.append(os.path.dirname(__file__))
+
+from call_node import CallNode
+from elf_reader import ElfFile
+from trace_log import EVENT_ENTRY, EVENT_NAMES, EVENT_RETURN, TraceRecord, read_trace
+
+
+class Symbols:
+    """Names for the traced pcs, from the binary's symbols and FDEs when it is given."""
+
+    def __init__(self, binary: str = None, load_base: int = 0):
+        self.starts = []
+        self.names = []
+        if binary:
+            with ElfFile(binary) as elf:
+                bias = elf.load_bias(load_base)
+                for function_range in elf.function_ranges():
+                    if function_range.name:
+                        self.starts.append(bias + function_range.start)
+                        self.names.append(function_range.name)
+
+    def name(self, pc: int) -> str:
+        index = bisect_right(self.starts, pc) - 1
+        if index >= 0 and self.starts[index] == pc:
+            return self.names[index]
+        return f"0x{pc:x}"
+
+
+def print_counts(records: list[TraceRecord], symbols: Symbols, top: int) -> None:
+    counts = Counter(record.pc for record in records if record.event == EVENT_ENTRY)
+    print(f"[*] Calls per function ({len(counts)} functions):")
+    for pc, count in counts.most_common(top):
+        print(f"- {symbols.name(pc):30} @ 0x{pc:x} | called {count} times")
+
+
+def build_call_trees(records: list[TraceRecord], symbols: Symbols) -> dict[int, dict[int, CallNode]]:
+    """Per-thread call trees, replaying the entry/return events through a stack."""
+    trees: dict[int, dict[int, CallNode]] = defaultdict(dict)
+    stacks: dict[int, list[CallNode]] = defaultdict(list)
+
+    for record in records:
+        stack = stacks[record.thread]
+        if record.event == EVENT_ENTRY:
+            if stack:
+                node = stack[-1].child(symbols.name(record.pc), record.pc)
+            else:
+                roots = trees[record.thread]
+                node = roots.get(record.pc) or roots.setdefault(record.pc, CallNode(symbols.name(record.pc), record.pc))
+            node.calls += 1
+            stack.append(node)
+        elif record.event == EVENT_RETURN:
+            # unwind to the returning function, entries without a return (longjmp, lost records) are dropped
+            for depth in range(len(stack) - 1, -1, -1):
+                if stack[depth].addr == record.pc:
+                    del stack[depth:]
+                    break
+    return trees
+
+
+def print_trees(records: list[TraceRecord], symbols: Symbols) -> None:
+    if not any(record.event == EVENT_RETURN for record in records):
+        print("[#] The trace has no return events (record it with `track_flow get-flow`), trees are flat.")
+    for thread, roots in build_call_trees(records, symbols).items():
+        print(f"[*] Thread {thread}:")
+        for root in roots.values():
+            root.print_tree(indent=1)
+
+
+def print_timelines(records: list[TraceRecord], symbols: Symbols, limit: int) -> None:
+    if not records:
+        return
+    origin = records[0].timestamp
+    per_thread: dict[int, list[TraceRecord]] = defaultdict(list)
+    for record in records:
+        per_thread[record.thread].append(record)
+
+    for thread, thread_records in per_thread.items():
+        first, last = thread_records[0].timestamp, thread_records[-1].timestamp
+        print(f"[*] Thread {thread}: {len(thread_records)} events, "
+              f"{(first - origin) / 1e6:.3f}ms -> {(last - origin) / 1e6:.3f}ms")
+        for record in thread_records[:limit]:
+            print(f"\t{(record.timestamp - origin) / 1e6:12.3f}ms  {EVENT_NAMES.get(record.event, '?'):6}  "
+                  f"{symbols.name(record.pc)}")
+        if len(thread_records) > limit:
+            print(f"\t... {len(thread_records) - limit} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", help="trace log written by break_on_functions")
+    parser.add_argument("--counts", action="store_true", help="calls per function")
+    parser.add_argument("--tree", action="store_true", help="per-thread call trees")
+    parser.add_argument("--timeline", action="store_true", help="per-thread event timelines")
+    parser.add_argument("--top", type=int, default=50, help="functions shown by --counts")
+    parser.add_argument("--limit", type=int, default=100, help="events shown per thread by --timeline")
+    parser.add_argument("--binary", help="the traced binary, to name the functions")
+    parser.add_argument("--load-base", type=lambda value: int(value, 0), default=0,
+                        help="address the binary was loaded at (PIEs)")
+    args = parser.parse_args()
+
+    records = list(read_trace(args.trace))
+    symbols = Symbols(args.binary, args.load_base)
+    print(f"[*] {len(records)} records in {args.trace}")
+
+    # counts are the default report
+    if args.counts or not (args.tree or args.timeline):
+        print_counts(records, symbols, args.top)
+    if args.tree:
+        print_trees(records, symbols)
+    if args.timeline:
+        print_timelines(records, symbols, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import mmap
+import os
+import struct
+import time
+from typing import Iterator, NamedTuple
+
+TRACE_MAGIC: bytes = b"GDBITRC1"
+# magic, record size, capacity (in records), records written so far (updated on flush)
+TRACE_HEADER = struct.Struct("<8sIIQ")
+TRACE_HEADER_SIZE: int = 64
+# monotonic timestamp (ns), thread id (LWP), pc, event type
+TRACE_RECORD = struct.Struct("<QQQB7x")
+
+DEFAULT_TRACE_CAPACITY: int = 1 << 20  # records, 32 MB
+
+EVENT_ENTRY: int = 1
+EVENT_RETURN: int = 2
+EVENT_NAMES: dict[int, str] = {EVENT_ENTRY: "entry", EVENT_RETURN: "return"}
+
+
+class TraceRecord(NamedTuple):
+    timestamp: int
+    thread: int
+    pc: int
+    event: int
+
+
+class TraceLogWriter:
+    """
+    Fixed-size records appended to a memory-mapped ring buffer file.
+    Appending is a single `pack_into`, and the data is in the page cache as soon as it is written,
+    so the log survives gdb crashing. Once full, the oldest records are overwritten.
+    """
+
+    def __init__(self, path: str, capacity: int = DEFAULT_TRACE_CAPACITY):
+        if capacity <= 0:
+            raise ValueError(f"the capacity must be a positive number of records, got {capacity}")
+        self.path = path
+        self.capacity = capacity
+        self.count = 0
+
+        size = TRACE_HEADER_SIZE + capacity * TRACE_RECORD.size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.ftruncate(self.fd, size)
+        self.buffer = mmap.mmap(self.fd, size)
+        self.flush()
+
+    def append(self, thread: int, pc: int, event: int) -> None:
+        offset = TRACE_HEADER_SIZE + (self.count % self.capacity) * TRACE_RECORD.size
+        TRACE_RECORD.pack_into(self.buffer, offset, time.monotonic_ns(), thread, pc, event)
+        self.count += 1
+
+    def flush(self) -> None:
+        TRACE_HEADER.pack_into(self.buffer, 0, TRACE_MAGIC, TRACE_RECORD.size, self.capacity, self.count)
+        self.buffer.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.buffer.close()
+        os.close(self.fd)
+
+
+def read_trace(path: str) -> Iterator[TraceRecord]:
+    """
+    Yield the records of a trace file, oldest first.
+    The records are ordered by timestamp rather than by the header's count, which is only written on
+    flush, so a log left behind by a crash reads back the same way.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        magic, record_size, capacity, _ = TRACE_HEADER.unpack_from(buffer, 0)
+        if magic != TRACE_MAGIC or record_size != TRACE_RECORD.size:
+            raise ValueError(f"Not a trace log: {path}")
+
+        end = TRACE_HEADER_SIZE + capacity * TRACE_RECORD.size
+        records = [TraceRecord(*record) for record in TRACE_RECORD.iter_unpack(buffer[TRACE_HEADER_SIZE:end])
+                   if record[0]]
+    finally:
+        buffer.close()
+
+    records.sort(key=lambda record: record.timestamp)
+    yield from records
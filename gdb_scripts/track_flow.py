@@ -1,65 +1,100 @@
 import sys
 import os
 import threading
-import time
 import gdb
 
 
 # Add the directory containing this script to sys.path
 sys.path.append(os.path.dirname(__file__))
 
-from call_node import CallNode
+from call_node import CallNode, write_folded, write_json
+from command_options import LOAD_OPTIONS, Option, one_of, parse_options, positive_float, positive_int
+from function_index import FunctionIndex
+from functions_finder import FunctionFinder
+from marker_search import MarkerSearch
+from narrowing import BisectSearch
+from proc_maps import mapping_table
 from break_on_functions import BreakOnFunctions, BreakInfo
 from run_trigger import RunTrigger
+from sampling_profiler import DEFAULT_SAMPLE_HZ, SamplingProfiler
+from shadow_stack import ShadowCallStacks
+from trace_log import EVENT_ENTRY, EVENT_RETURN
 
 MAX_STUCK_NARROW_AMOUNT: int = 3
+# rounds `frontier` runs at most, each one goes one call deeper
+DEFAULT_FRONTIER_ROUNDS: int = 16
+NARROW_STRATEGIES: tuple = ("stable", "bisect")
+# trigger rounds `narrow --strategy bisect` runs at most
+DEFAULT_BISECT_ROUNDS: int = 256
+# length of the idle window recorded by `diff`
+DEFAULT_BASELINE_SECONDS: float = 5.0
+# positional arguments and options of every subcommand, the ones running a trigger also take `LOAD_OPTIONS`
+SUBCOMMANDS: dict[str, tuple[tuple[str, ...], dict[str, Option]]] = {
+    "narrow": (("trigger path",), {
+        "--strategy": Option("strategy", one_of(NARROW_STRATEGIES)),
+        "--rounds": Option("max_rounds", positive_int),
+    }),
+    "diff": (("trigger path",), {"--baseline": Option("baseline_seconds", positive_float)}),
+    "frontier": (("trigger path",), {
+        "--roots": Option("roots", lambda text: text.split(",")),
+        "--rounds": Option("max_rounds", positive_int),
+    }),
+    "get-flow": (("trigger path",), {}),
+    "find-marker": (("trigger path", "marker string"), {}),
+    "sample": (("trigger path",), {
+        "--hz": Option("hz", positive_float),
+        "--duration": Option("duration", positive_float),
+    }),
+    "export": (("export format", "export path"), {}),
+}
 
 class TrackFlow(gdb.Command):
     def __init__(self):
         self.break_on_functions = BreakOnFunctions()
         self.run_trigger = RunTrigger()
-        self.root_calls = []
-        self.addr_to_node = {}  # to reuse nodes
-        self.last_stack = []
+        # `--concurrency` / `--repeat` of the current command, every round drives the target with them
+        self.trigger_options: dict = {}
+        self.call_flows = ShadowCallStacks()
+        # roots of the last tree built by `get-flow` or `sample`, for `export`
+        self.last_call_tree: list[CallNode] = []
+        self.marker_search: MarkerSearch = None
+        # addresses of the traced functions on the stack when the marker was found
+        self.marker_stack: list[int] = []
         super().__init__("track_flow", gdb.COMMAND_USER)
     
     def _can_narrow_down(self, current_call_info: BreakInfo, previous_call_info: BreakInfo) -> bool:
         """
         Determine if we can narrow down the search space based on the current and previous call information.
         """
-        print(f"[*] Current call info: {current_call_info}")
-        print(f"[*] Previous call info: {previous_call_info}")
-        return previous_call_info != current_call_info
+        print(f"[*] Current call info: {len(current_call_info)} functions")
+        print(f"[*] Previous call info: {len(previous_call_info)} functions")
+        return previous_call_info.keys() != current_call_info.keys()
 
     def run_script(self, trigger_path: str) -> None:
-        if not os.path.isfile(trigger_path):
-            print(f"[!] File not found: {trigger_path}")
-            return
-        
-        while not self.break_on_functions.can_run_script:
-            time.sleep(0.1)
+        self.break_on_functions.armed.wait()
+        round_id = self.break_on_functions.round_id
 
-        self.run_trigger.run_script(trigger_path)
+        try:
+            if not os.path.isfile(trigger_path):
+                print(f"[!] File not found: {trigger_path}")
+                return
 
-        self.break_on_functions.can_run_script = False
+            self.run_trigger.run(trigger_path, **self.trigger_options)
+        finally:
+            # ends the round even if the trigger failed
+            self.break_on_functions.trigger_finished(round_id)
 
 
-    def narrow_down(self, trigger_path: str):
+    def narrow_down(self, trigger_path: str, max_rounds: int = None) -> list[tuple[int, int, int]]:
         # wait for `break_on_functions.stop` to finish 
-        while self.break_on_functions.running:
-            time.sleep(0.01)
+        self.break_on_functions.stopped.wait()
 
+        self.break_on_functions.on_stop_function = self.break_on_functions.on_stop
+        rounds = []
         stuck_narrow_cnt = 0
-        current_break_info = BreakInfo()
-        prev_break_info = BreakInfo()
-
-        while stuck_narrow_cnt < MAX_STUCK_NARROW_AMOUNT:
-            if self._can_narrow_down(current_break_info, prev_break_info):
-                stuck_narrow_cnt = 0
-            else: 
-                stuck_narrow_cnt += 1
-            print(f"[*] Stuck narrow count: {stuck_narrow_cnt}")
+        prev_break_info = None
 
+        while stuck_narrow_cnt < MAX_STUCK_NARROW_AMOUNT and (max_rounds is None or len(rounds) < max_rounds):
             script_thread = threading.Thread(target=self.run_script, args=(trigger_path,))
             script_thread.start()
 
@@ -68,50 +103,174 @@ class TrackFlow(gdb.Command):
             # wait for the script to finish
             script_thread.join()
 
-            # get the break info after the iteration
+            # get the break info after the iteration, a new round records into a new table
             current_break_info = self.break_on_functions.get_break_info()
+            rounds.append((len(self.break_on_functions.proc_functions_address), len(current_break_info), len(current_break_info)))
             
             print(f"[*] Narrowing down from {len(self.break_on_functions.proc_functions_address)} to {len(current_break_info)}")
+            print(f"[*] Round took: {self.break_on_functions.format_round_timings()}")
+
+            if prev_break_info is None or self._can_narrow_down(current_break_info, prev_break_info):
+                stuck_narrow_cnt = 0
+            else: 
+                stuck_narrow_cnt += 1
+            print(f"[*] Stuck narrow count: {stuck_narrow_cnt}")
 
                 # we want to put breakpoints only on what was hit!
-            self.break_on_functions.set_break_addresses(list(map(lambda x: int(x,16), current_break_info)))
+            self.break_on_functions.set_break_addresses(list(current_break_info))
             
             prev_break_info = current_break_info
 
         self.break_on_functions.print_results()
-    
+        self.print_narrow_rounds(rounds)
+        return rounds
+
+    def print_narrow_rounds(self, rounds: list[tuple[int, int, int]], kept: str = "candidates") -> None:
+        print(f"[*] Narrowed in {len(rounds)} rounds (armed -> hit | {kept}):")
+        for index, (armed, hit, candidates) in enumerate(rounds, 1):
+            print(f"\t#{index:<3} {armed:8} -> {hit:<8} | {candidates}")
+
+    def _run_round(self, trigger_path: str, addresses: list[int], coverage: bool = False) -> BreakInfo:
+        """Arm `addresses`, run the trigger once and return what was hit."""
+        self.break_on_functions.on_stop_function = self.break_on_functions.on_stop
+        self.break_on_functions.set_break_addresses(addresses)
+
+        script_thread = threading.Thread(target=self.run_script, args=(trigger_path,))
+        script_thread.start()
+
+        self.break_on_functions.start(coverage=coverage)
+
+        # wait for the script to finish
+        script_thread.join()
+        return self.break_on_functions.get_break_info()
+
+    def _run_idle_round(self, addresses: list[int], seconds: float) -> BreakInfo:
+        """Arm `addresses` for `seconds` without running the trigger and return what was hit anyway."""
+        self.break_on_functions.on_stop_function = self.break_on_functions.on_stop
+        self.break_on_functions.set_break_addresses(addresses)
+        self.break_on_functions.start(seconds, coverage=True)
+        return self.break_on_functions.get_break_info()
+
+    def narrow_down_bisect(self, trigger_path: str, max_rounds: int = DEFAULT_BISECT_ROUNDS) -> list[tuple[int, int, int]]:
+        """
+        Narrow by group testing instead of replaying everything that was hit: a first round with every
+        function armed gives the candidates, then `BisectSearch` arms halves of them in separate
+        rounds and keeps the halves the trigger still hits, falling back to delta debugging for the
+        functions that only fire together. Rounds run in coverage mode since only the hit sets matter.
+        """
+        self.break_on_functions.stopped.wait()
+
+        armed = sorted(self.break_on_functions.proc_functions_address)
+        break_info = self._run_round(trigger_path, armed, coverage=True)
+        print(f"[*] Round 1: {len(armed)} armed, {len(break_info)} hit")
+
+        def run_round(group: list[int]) -> set[int]:
+            hits = set(self._run_round(trigger_path, group, coverage=True))
+            print(f"[*] Round {len(search.rounds) + 2}: {len(group)} armed, {len(hits)} hit, "
+                  f"{search.candidates} candidates")
+            print(f"[*] Round took: {self.break_on_functions.format_round_timings()}")
+            return hits
+
+        search = BisectSearch(run_round, max_rounds - 1)
+        groups = search.run(list(break_info))
+        rounds = [(len(armed), len(break_info), len(break_info)), *search.rounds]
+
+        if search.pending:
+            print(f"[#] Stopped after {max_rounds} rounds, {len(search.pending)} groups were not split.")
+        print("\n[+] Trigger specific functions:")
+        for group in sorted(groups):
+            if len(group) > 1:
+                print("[*] Only firing together:")
+            for addr in group:
+                print(f"- {self.break_on_functions.symbolizer.name(addr):30} @ 0x{addr:x}")
+        self.print_narrow_rounds(rounds)
+        self.break_on_functions.set_break_addresses(sorted(addr for group in groups for addr in group))
+        return rounds
+
+    def resolve_roots(self, roots: list[str]) -> list[int]:
+        """Addresses of `roots`, given as addresses or function names."""
+        addresses = []
+        for root in roots:
+            try:
+                addresses.append(int(root, 0))
+            except ValueError:
+                # minimal symbols too, stripped of debug info
+                addresses.append(int(gdb.parse_and_eval(f"(unsigned long) &{root}")))
+        return addresses
+
+    def frontier(self, trigger_path: str, roots: list[int] = None, max_rounds: int = DEFAULT_FRONTIER_ROUNDS):
+        """
+        Walk the static call graph instead of arming everything: a round arms only the frontier,
+        `roots` at first (by default the entries, functions nothing calls directly), then the
+        callees of what the previous round hit that were never armed. Stops once nothing new is reached.
+        A function called directly from an unexplored caller and indirectly from a hit one is missed.
+        """
+        self.break_on_functions.stopped.wait()
+
+        graph = self.break_on_functions.get_call_graph()
+        entries = graph.entries()
+        print(f"[*] Call graph: {len(graph)} functions, {graph.edges} direct calls, {len(entries)} entries.")
+
+        frontier = sorted(set(roots)) if roots else entries
+        explored: set[int] = set()
+        reached: set[int] = set()
+        rounds = []
+
+        while frontier and len(rounds) < max_rounds:
+            break_info = self._run_round(trigger_path, frontier, coverage=True)
+            explored.update(frontier)
+            reached.update(break_info)
+            rounds.append((len(frontier), len(break_info), len(reached)))
+
+            frontier = graph.frontier(break_info, explored)
+            print(f"[*] Round {len(rounds)}: {rounds[-1][0]} armed, {rounds[-1][1]} hit, "
+                  f"{len(reached)} reached, {len(frontier)} callees next")
+            print(f"[*] Round took: {self.break_on_functions.format_round_timings()}")
+
+        if frontier:
+            print(f"[#] Stopped after {max_rounds} rounds, {len(frontier)} callees were not armed.")
+        print("\n[+] Functions reached by the trigger:")
+        for addr in sorted(reached):
+            print(f"- {self.break_on_functions.symbolizer.name(addr):30} @ 0x{addr:x}")
+        self.print_narrow_rounds(rounds, kept="reached")
+        self.break_on_functions.set_break_addresses(sorted(reached))
+
+    def diff(self, trigger_path: str, baseline_seconds: float = DEFAULT_BASELINE_SECONDS):
+        """
+        Record which functions run while idle, then which run with the trigger, and keep the
+        difference. Both windows are coverage runs over every known function, compared as bitmaps.
+        """
+        self.break_on_functions.stopped.wait()
+
+        candidates = list(self.break_on_functions.proc_functions_address)
+        index = FunctionIndex(candidates)
+
+        print(f"[*] Recording a {baseline_seconds}s idle baseline.")
+        baseline = index.to_bitmap(self._run_idle_round(candidates, baseline_seconds))
+
+        print("[*] Recording the trigger window.")
+        break_info = self._run_round(trigger_path, candidates, coverage=True)
+        triggered = index.to_bitmap(break_info)
+
+        trigger_only = index.from_bitmap(index.only_in(triggered, baseline))
+        print(f"[*] Baseline hit {baseline.bit_count()}, trigger window hit {triggered.bit_count()}, "
+              f"{len(trigger_only)} only with the trigger.")
+
+        print("\n[+] Trigger specific functions:")
+        for addr in trigger_only:
+            print(f"- {self.break_on_functions.symbolizer.name(addr):30} @ 0x{addr:x}")
+        self.break_on_functions.set_break_addresses(trigger_only)
+
     def get_flow_on_stop(self, event):
         if not isinstance(event, gdb.BreakpointEvent):
             return
 
         try:
+            # only the function we just entered is looked at, the rest of the path is the shadow stack
             frame = gdb.newest_frame()
-            stack = []
-            while frame:
-                sal = frame.find_sal()
-                pc = sal.pc
-                sym = frame.name()
-                name = sym if sym else "unknown"
-                stack.append((name, pc))
-                frame = frame.older()
-            stack.reverse()
-
-            # Build or reuse tree
-            current_level = None
-            for name, addr in stack:
-                # if addr not in self.break_on_functions.proc_functions_address:
-                #     continue
-                node = self.addr_to_node.get(addr)
-                if not node:
-                    node = CallNode(name, addr)
-                    self.addr_to_node[addr] = node
-
-                if current_level is None:
-                    if node not in self.root_calls:
-                        self.root_calls.append(node)
-                    current_level = node
-                else:
-                    current_level = current_level.add_child(node)
+            self.break_on_functions.log_event(frame.pc(), EVENT_ENTRY)
+            # named at report time, see `print_call_flows`
+            self.call_flows.enter(frame, None, frame.pc())
 
         except Exception as e:
             print(f"[!] Error in get_flow_on_stop: {e}")
@@ -119,17 +278,40 @@ class TrackFlow(gdb.Command):
         # Resume execution
         gdb.execute("continue")
 
-    def print_call_flows(self):
+    def print_call_flows(self, per_thread: bool = True):
         print("[*] Call Flows:")
-        for root in self.root_calls:
-            root.print_tree()
+        if per_thread:
+            trees = [(thread, list(roots.values())) for thread, roots in sorted(self.call_flows.root_calls.items())]
+        else:
+            trees = [(None, self.call_flows.merged_roots())]
+
+        for thread, roots in trees:
+            if thread is not None:
+                print(f"[*] Thread {thread}:")
+            for root in roots:
+                root.print_tree(out=lambda text: gdb.write(text + "\n"))
+
+    def export_call_tree(self, fmt: str, path: str) -> None:
+        """Stream the last call tree to `path` as folded stacks (flamegraph) or JSON."""
+        writers = {"folded": write_folded, "json": write_json}
+        if fmt not in writers:
+            print(f"[!] Unknown export format: {fmt}, expected one of {', '.join(writers)}")
+            return
+        if not self.last_call_tree:
+            print("[#] No call tree yet, run `get-flow` or `sample` first")
+            return
+
+        with open(path, "w") as f:
+            writers[fmt](self.last_call_tree, f)
+        print(f"[+] Wrote the call tree to {path}")
 
     def get_flow(self, trigger_path: str):
         # wait for `break_on_functions.stop` to finish 
-        while self.break_on_functions.running:
-            time.sleep(0.01)
+        self.break_on_functions.stopped.wait()
 
         self.break_on_functions.on_stop_function = self.get_flow_on_stop
+        self.call_flows = ShadowCallStacks(
+            on_return=lambda addr: self.break_on_functions.log_event(addr, EVENT_RETURN))
 
         script_thread = threading.Thread(target=self.run_script, args=(trigger_path,))
         script_thread.start()
@@ -138,70 +320,171 @@ class TrackFlow(gdb.Command):
             
         # wait for the script to finish
         script_thread.join()
-
-        print("joined")
+        self.call_flows.clear()
+        for roots in self.call_flows.root_calls.values():
+            self.break_on_functions.symbolizer.fill_names(roots.values())
+        self.last_call_tree = self.call_flows.merged_roots()
 
         self.print_call_flows()
     
     def find_marker_on_stop(self, event):
         if not isinstance(event, gdb.BreakpointEvent):
             return
-    
-        if "recv" in gdb.newest_frame().name():        
-            # TODO: add code here
-            import ipdb; ipdb.set_trace()
+
+        try:
+            frame = gdb.newest_frame()
+            self.break_on_functions.log_event(frame.pc(), EVENT_ENTRY)
+            self.call_flows.enter(frame, None, frame.pc())
+
+            if (found := self.marker_search.check(frame)) is not None:
+                thread = gdb.selected_thread().num
+                # the traced functions on this thread's shadow stack, outermost first
+                self.marker_stack = [node.addr for node in self.call_flows.stacks.get(thread, [])]
+                print(f"[+] Marker found @ 0x{found:x} by the {self.marker_search.found_by} "
+                      f"(thread {thread}, in {self.break_on_functions.symbolizer.name(frame.pc())})")
+
+        except Exception as e:
+            print(f"[!] Error in find_marker_on_stop: {e}")
 
         # Resume execution
         gdb.execute("continue")
 
-
-    def find_marker(self, trigger_path: str, maker: str):
+    def find_marker(self, trigger_path: str, marker: str):
+        """
+        Run the trigger and report which traced functions were on the stack when the marker it
+        sends first shows up in the inferior's writable memory.
+        """
         # wait for `break_on_functions.stop` to finish 
-        while self.break_on_functions.running:
-            time.sleep(0.01)
+        self.break_on_functions.stopped.wait()
 
+        finder = FunctionFinder()
+        # the heap and anonymous mappings grow without an event, start from a fresh table
+        mapping_table.invalidate()
+        self.marker_search = MarkerSearch(marker.encode(), finder.get_proc_mappings(all_objfiles=True), finder.proc_arch)
+        print(f"[*] Searching {len(self.marker_search.regions)} writable regions for {marker!r}.")
+        if baseline := self.marker_search.record_baseline():
+            print(f"[#] {baseline} copies already in memory are ignored.")
+
+        self.marker_stack = []
         self.break_on_functions.on_stop_function = self.find_marker_on_stop
+        self.call_flows = ShadowCallStacks(
+            on_return=lambda addr: self.break_on_functions.log_event(addr, EVENT_RETURN))
 
         script_thread = threading.Thread(target=self.run_script, args=(trigger_path,))
         script_thread.start()
 
         self.break_on_functions.start()
-            
+
         # wait for the script to finish
         script_thread.join()
+        self.call_flows.clear()
+        self.print_marker_result()
+
+    def print_marker_result(self):
+        search = self.marker_search
+        print(f"[*] Searched {search.bytes_searched / (1024 * 1024):.1f} MB during the round.")
+        if search.found_addr is None:
+            print("[-] The marker was not found in memory, the sweep may not have reached it before the trigger ended.")
+            return
+
+        if search.found_by == "sweep":
+            # the sweep lags behind the writes, the marker may have landed a few stops earlier
+            print("[#] Found by the background sweep, the stack below may be later than the write.")
+        print(f"[+] Traced functions on the stack when 0x{search.found_addr:x} held the marker:")
+        for depth, addr in enumerate(self.marker_stack):
+            print(f"{'  ' * depth}- {self.break_on_functions.symbolizer.name(addr):30} @ 0x{addr:x}")
+
+    def sample(self, trigger_path: str, hz: float = DEFAULT_SAMPLE_HZ, duration: float = None):
+        """
+        Profile by sampling the stacks of all threads `hz` times per second while the trigger runs
+        (or for `duration` seconds when the trigger is `-`).
+        """
+        self.break_on_functions.stopped.wait()
+
+        if trigger_path == "-" and duration is None:
+            print("[#] Sampling without a trigger needs --duration")
+            return
+        if trigger_path != "-" and duration is not None:
+            # cutting the sampling short would leave the inferior stopped under a running trigger
+            print("[#] --duration is for sampling without a trigger, a trigger is sampled until it ends")
+            return
+
+        profiler = SamplingProfiler(hz, self.break_on_functions.symbolizer)
+
+        def run_trigger():
+            try:
+                self.run_trigger.run(trigger_path, **self.trigger_options)
+            finally:
+                profiler.done.set()
 
+        script_thread = None
+        if trigger_path != "-":
+            script_thread = threading.Thread(target=run_trigger)
+            script_thread.start()
+
+        print(f"[*] Sampling at {hz} Hz.")
+        profiler.run(duration)
+
+        if script_thread is not None:
+            script_thread.join()
+
+        self.last_call_tree = list(profiler.root_calls.values())
+        profiler.print_profile()
 
     def invoke(self, arg, from_tty):
         args = gdb.string_to_argv(arg)
 
         if not args:
-            print("[!] Usage: track_flow narrow </path/to/script.py> | get-flow </path/to/script.py> | find-marker </path/to/script.py> <marker_string> ")
+            print("[!] Usage: track_flow narrow </path/to/script.py> [--strategy stable|bisect] [--rounds N] | diff </path/to/script.py> [--baseline SECONDS] | frontier </path/to/script.py> [--roots FUNC,...] [--rounds N] | get-flow </path/to/script.py> | find-marker </path/to/script.py> <marker_string> | sample </path/to/script.py> [--hz N] | sample - --duration SECONDS [--hz N] | export <folded|json> <path> (triggers take [--concurrency N] [--repeat M])")
             return
         
         cmd = args[0]
+        if cmd not in SUBCOMMANDS:
+            print(f"Command: {cmd} is an Unknown command")
+            return
 
-        if len(args) < 2:
-            print("[#] Missing trigger path")
+        positional_names, subcommand_options = SUBCOMMANDS[cmd]
+        positional = args[1:1 + len(positional_names)]
+        if len(positional) < len(positional_names):
+            print(f"[#] Missing {positional_names[len(positional)]}")
             return
 
-        trigger_path = args[1]
+        # what follows the positional arguments are options, the subcommand's own and the trigger's
+        if cmd != "export":
+            subcommand_options = {**subcommand_options, **LOAD_OPTIONS}
+        try:
+            options = parse_options(args[1 + len(positional_names):], subcommand_options)
+            if "roots" in options:
+                options["roots"] = self.resolve_roots(options["roots"])
+        except (ValueError, gdb.error) as e:
+            print(f"[!] Bad option: {e}")
+            return
+        self.trigger_options = {option.key: options.pop(option.key)
+                                for option in LOAD_OPTIONS.values() if option.key in options}
+
+        if cmd == "export":
+            self.export_call_tree(*positional)
+
+        elif cmd == "narrow":
+            if options.pop("strategy", NARROW_STRATEGIES[0]) == "bisect":
+                self.narrow_down_bisect(*positional, **options)
+            else:
+                self.narrow_down(*positional, **options)
 
-        if cmd == "narrow":
-            self.narrow_down(trigger_path)
+        elif cmd == "diff":
+            self.diff(*positional, **options)
+
+        elif cmd == "frontier":
+            self.frontier(*positional, **options)
 
         elif cmd == "get-flow":
-            self.get_flow(trigger_path)
+            self.get_flow(*positional)
             
         elif cmd == "find-marker":
-            if len(args) < 3:
-                print("[#] Missing marker string")
-                return
-            
-            marker = args[2] 
-            self.find_marker(trigger_path, marker)
-        
-        else:
-            print(f"Command: {cmd} is an Unknown command")
+            self.find_marker(*positional)
+
+        elif cmd == "sample":
+            self.sample(*positional, **options)
         
-# Register the command
-TrackFlow()
+# Register the command, scripts driving gdb (benchmarks, batch workers) reuse this instance
+track_flow_command = TrackFlow()
@@ -0,0 +1,29 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# The scripts are flat modules loaded by gdb, import them the same way
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gdb_scripts"))
+
+SAMPLE_SOURCE = """
+__attribute__((noinline)) int leaf(int x) { return x * 3; }
+__attribute__((noinline)) int caller(int x) { return leaf(x) + 1; }
+int main(int argc, char **argv) { return caller(argc); }
+"""
+
+
+@pytest.fixture(scope="session")
+def sample_binary(tmp_path_factory) -> str:
+    """A small PIE with a build-id, symbols and unwind tables."""
+    compiler = shutil.which("cc") or shutil.which("gcc")
+    if compiler is None:
+        pytest.skip("no C compiler")
+    work_dir = tmp_path_factory.mktemp("sample")
+    source = work_dir / "sample.c"
+    source.write_text(SAMPLE_SOURCE)
+    binary = work_dir / "sample"
+    subprocess.run([compiler, "-O1", "-fPIE", "-pie", "-Wl,--build-id", "-o", str(binary), str(source)], check=True)
+    return str(binary)
@@ -0,0 +1,64 @@
+import struct
+
+from call_graph import CALL_SITE_SIZE, CallGraph, find_call_sites
+from parallel_scan import ChunkedScanner
+
+
+def x86_call(site: int, target: int, opcode: int = 0xe8) -> bytes:
+    return bytes([opcode]) + struct.pack("<i", target - (site + 5))
+
+
+def test_x86_64_calls_and_tail_jumps():
+    base = 0x401000
+    code = x86_call(base, 0x401100) + b"\x90" * 3 + x86_call(base + 8, 0x400f00, opcode=0xe9)
+    sites = sorted(find_call_sites("i386:x86-64", code, 0, len(code), base))
+    assert sites == [(base, 0x401100), (base + 8, 0x400f00)]
+
+
+def test_x86_window_only_reports_sites_starting_in_it():
+    code = b"\x90" * 4 + x86_call(4, 0x100)
+    assert list(find_call_sites("i386:x86-64", code, 0, 4, 0)) == []
+    assert list(find_call_sites("i386:x86-64", code, 4, 5, 0)) == [(4, 0x100)]
+
+
+def test_aarch64_bl_and_b():
+    base = 0x10000
+    bl_forward = 0x94000000 | 0x10  # bl +0x40
+    b_backward = 0x14000000 | (-4 & 0x3ffffff)  # b -0x10
+    nop = 0xd503201f
+    code = struct.pack("<III", bl_forward, nop, b_backward)
+    assert list(find_call_sites("aarch64", code, 0, len(code), base)) == [(base, base + 0x40), (base + 8, base - 8)]
+
+
+def test_arm_bl():
+    # bl with the pc 8 bytes ahead
+    code = struct.pack("<I", 0xeb000002)
+    assert list(find_call_sites("arm", code, 0, 4, 0x8000)) == [(0x8000, 0x8000 + 8 + 8)]
+
+
+def test_unknown_arch_yields_nothing():
+    assert list(find_call_sites("mips", b"\xe8\x00\x00\x00\x00", 0, 5, 0)) == []
+
+
+def test_graph_keeps_edges_to_function_starts_only():
+    graph = CallGraph([0x100, 0x200, 0x300])
+    graph.add_calls([(0x110, 0x200), (0x120, 0x300), (0x210, 0x300), (0x220, 0x250), (0x50, 0x100)])
+
+    assert graph.edges == 3
+    assert graph.callees[0x100] == {0x200, 0x300}
+    assert graph.callers[0x300] == {0x100, 0x200}
+    assert graph.entries() == [0x100]
+    assert graph.frontier([0x100], explored={0x100, 0x200}) == [0x300]
+
+
+def test_chunked_sites_match_the_whole_buffer():
+    # the way FunctionFinder.iter_call_sites reads text through gdb, calls straddle the chunk edges
+    base = 0x400000
+    code = b"".join(b"\x90" * (index % 7) + x86_call(0, 0x1000 * index) for index in range(200))
+    chunker = ChunkedScanner([], 1, 64, overlap=CALL_SITE_SIZE - 1)
+
+    chunked = []
+    for chunk_base, chunk, scan_start, scan_end in chunker.iter_chunks(
+            lambda addr, size: code[addr - base:addr - base + size], base, len(code)):
+        chunked.extend(find_call_sites("i386:x86-64", chunk, scan_start, scan_end, chunk_base))
+    assert sorted(chunked) == sorted(find_call_sites("i386:x86-64", code, 0, len(code), base))
@@ -0,0 +1,51 @@
+import io
+import json
+
+from call_node import CallNode, write_folded, write_json
+
+
+def make_tree() -> CallNode:
+    root = CallNode("main", 0x1000)
+    root.calls = 1
+    handler = root.child("handler", 0x2000)
+    handler.calls = 3
+    handler.child(None, 0x3000).calls = 2
+    root.child("idle", 0x4000).calls = 5
+    return root
+
+
+def test_folded_weights_by_calls_without_samples():
+    out = io.StringIO()
+    write_folded([make_tree()], out)
+    assert out.getvalue().splitlines() == [
+        "main 1",
+        "main;handler 3",
+        "main;handler;0x3000 2",
+        "main;idle 5",
+    ]
+
+
+def test_folded_weights_by_self_samples():
+    root = make_tree()
+    root.total_hits, root.self_hits = 4, 1
+    root.child("idle", 0x4000).self_hits = 3
+    out = io.StringIO()
+    write_folded([root], out)
+    assert out.getvalue().splitlines() == ["main 1", "main;idle 3"]
+
+
+def test_json_matches_the_tree():
+    out = io.StringIO()
+    write_json([make_tree(), CallNode("worker", 0x5000)], out)
+    trees = json.loads(out.getvalue())
+
+    assert [tree["name"] for tree in trees] == ["main", "worker"]
+    assert [child["name"] for child in trees[0]["children"]] == ["handler", "idle"]
+    leaf = trees[0]["children"][0]["children"][0]
+    assert leaf == {"name": None, "addr": 0x3000, "calls": 2, "self_hits": 0, "total_hits": 0, "children": []}
+
+
+def test_merge_adds_counters_and_subtrees():
+    merged = make_tree().merge(make_tree())
+    assert merged.calls == 2
+    assert merged.child("handler", 0x2000).child(None, 0x3000).calls == 4
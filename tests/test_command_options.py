@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from command_options import parse_finder_options, parse_load_options
+
+
+def test_load_options():
+    assert parse_load_options([]) == {}
+    assert parse_load_options(["--concurrency", "4", "--repeat", "100"]) == {"concurrency": 4, "repeat": 100}
+
+
+@pytest.mark.parametrize("args", [
+    ["--concurrency", "0"],
+    ["--repeat", "-1"],
+    ["--repeat", "many"],
+    ["--repeat"],
+    ["--bogus", "1"],
+])
+def test_load_options_rejects(args):
+    with pytest.raises(ValueError):
+        parse_load_options(args)
+
+
+def test_finder_options():
+    assert parse_finder_options(["--no-cache", "--jobs", "2", "--chunk-size", "0x10000"]) == \
+        {"use_cache": False, "jobs": 2, "chunk_size": 0x10000}
+    assert parse_finder_options(["--jobs", "0"]) == {"jobs": os.cpu_count() or 1}
+
+
+@pytest.mark.parametrize("args", [
+    ["--chunk-size", "0"],
+    ["--chunk-size", "-4096"],
+    ["--chunk-size", "8"],
+    ["--jobs", "-1"],
+    ["--jobs", "two"],
+    ["--threads", "2"],
+])
+def test_finder_options_rejects(args):
+    with pytest.raises(ValueError):
+        parse_finder_options(args)
@@ -0,0 +1,30 @@
+import pytest
+
+from elf_reader import ElfFile
+
+
+def test_rejects_non_elf(tmp_path):
+    path = tmp_path / "script.sh"
+    path.write_bytes(b"#!/bin/sh\n")
+    with pytest.raises(ValueError):
+        ElfFile(str(path))
+
+
+def test_reads_build_id_and_pie(sample_binary):
+    with ElfFile(sample_binary) as elf:
+        assert elf.is_pie
+        assert elf.build_id and len(elf.build_id) == 20
+        assert elf.load_bias(0x555555554000) == 0x555555554000 - elf.min_load_vaddr
+
+
+def test_function_ranges_are_named_and_sized(sample_binary):
+    with ElfFile(sample_binary) as elf:
+        ranges = {function_range.name: function_range for function_range in elf.function_ranges()}
+        starts = elf.function_starts()
+        entry = elf.entry
+
+    for name in ("leaf", "caller", "main"):
+        assert ranges[name].size > 0
+        assert ranges[name].start in starts
+    assert entry in starts
+    assert ranges["leaf"].end <= ranges["caller"].start or ranges["caller"].end <= ranges["leaf"].start
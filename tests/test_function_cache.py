@@ -0,0 +1,42 @@
+import os
+import shutil
+
+from function_cache import FunctionCache, binary_key, read_build_id
+
+
+def test_store_then_load(tmp_path, sample_binary):
+    cache = FunctionCache(str(tmp_path / "cache"))
+    assert cache.load(sample_binary, "i386:x86-64") is None
+
+    cache.store(sample_binary, "i386:x86-64", [0x1130, 0x1040, 0x1130])
+    assert list(cache.load(sample_binary, "i386:x86-64")) == [0x1040, 0x1130]
+    # the architecture is part of the key
+    assert cache.load(sample_binary, "aarch64") is None
+
+
+def test_copies_share_the_build_id_key(tmp_path, sample_binary):
+    copy = tmp_path / "copy"
+    shutil.copy2(sample_binary, copy)
+    assert read_build_id(str(copy)) == read_build_id(sample_binary)
+    assert binary_key(str(copy), "x") == binary_key(sample_binary, "x")
+
+
+def test_rebuilt_binary_invalidates_the_entry(tmp_path, sample_binary):
+    binary = tmp_path / "binary"
+    shutil.copy2(sample_binary, binary)
+    cache = FunctionCache(str(tmp_path / "cache"))
+    cache.store(str(binary), "x", [1, 2, 3])
+
+    # same build-id, but rewritten in place
+    stat = os.stat(binary)
+    os.utime(binary, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.load(str(binary), "x") is None
+    assert not os.path.exists(cache.path_for(str(binary), "x"))
+
+
+def test_binaries_without_build_id_are_keyed_by_content(tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.write_bytes(b"not an elf")
+    second.write_bytes(b"not an elf either")
+    assert read_build_id(str(first)) is None
+    assert binary_key(str(first), "x") != binary_key(str(second), "x")
@@ -0,0 +1,26 @@
+from function_index import FunctionIndex
+
+ADDRESSES = [0x1300, 0x1000, 0x1100, 0x1200, 0x1100]
+
+
+def test_bitmap_round_trip():
+    index = FunctionIndex(ADDRESSES)
+    assert len(index) == 4
+    bitmap = index.to_bitmap([0x1200, 0x1000])
+    assert bitmap == 0b101
+    assert index.from_bitmap(bitmap) == [0x1000, 0x1200]
+    assert index.from_bitmap(index.to_bitmap(ADDRESSES)) == sorted(set(ADDRESSES))
+
+
+def test_addresses_outside_the_index_are_ignored():
+    index = FunctionIndex(ADDRESSES)
+    assert index.to_bitmap([0x1100, 0x9999]) == index.to_bitmap([0x1100])
+    assert index.from_bitmap(index.to_bitmap([])) == []
+
+
+def test_only_in():
+    index = FunctionIndex(range(0, 0x100 * 20, 0x100))
+    triggered = index.to_bitmap([0x0, 0x500, 0x900, 0x1300])
+    baseline = index.to_bitmap([0x0, 0x900, 0x1000])
+    assert index.from_bitmap(index.only_in(triggered, baseline)) == [0x500, 0x1300]
+    assert index.only_in(baseline, baseline) == 0
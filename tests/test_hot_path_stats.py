@@ -0,0 +1,42 @@
+from hot_path_stats import HotPathStats, LatencyHistogram
+
+
+def test_percentiles_are_bucket_upper_bounds():
+    histogram = LatencyHistogram()
+    for _ in range(98):
+        histogram.record(100)  # 7 bits, below 128
+    histogram.record(1000)  # 10 bits, below 1024
+    histogram.record(5000)  # 13 bits, below 8192
+
+    assert histogram.count == 100
+    assert histogram.total_ns == 98 * 100 + 1000 + 5000
+    assert histogram.percentile(50) == 128
+    assert histogram.percentile(98) == 128
+    assert histogram.percentile(99) == 1024
+    # capped by the largest recorded duration
+    assert histogram.percentile(100) == 5000
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0
+    assert histogram.to_dict() == {"count": 0, "total_ns": 0, "max_ns": 0, "buckets": {}}
+
+
+def test_zero_and_huge_durations_have_buckets():
+    histogram = LatencyHistogram()
+    histogram.record(0)
+    histogram.record(1 << 70)
+    assert histogram.to_dict()["buckets"] == {"1": 1, str(1 << 63): 1}
+
+
+def test_disabled_stats_record_nothing():
+    stats = HotPathStats()
+    stats.record("resolve", 10)
+    stats.count("stops")
+    stats.enabled = False
+    stats.record("resolve", 10)
+    stats.count("stops")
+
+    assert stats.phases["resolve"].count == 1
+    assert stats.counters == {"stops": 1}
@@ -0,0 +1,58 @@
+import pytest
+
+from narrowing import BisectSearch, split
+
+
+def fires_alone(functions: set[int]):
+    """A trigger hitting `functions` whatever else is armed."""
+    return lambda group: functions.intersection(group)
+
+
+def test_split_covers_the_group_evenly():
+    assert split(list(range(7)), 3) == [[0, 1, 2], [3, 4], [5, 6]]
+    assert split([1, 2], 2) == [[1], [2]]
+
+
+@pytest.mark.parametrize("triggered", [{37}, {3, 90, 91}, set(range(0, 128, 16))])
+def test_finds_the_functions_firing_on_their_own(triggered):
+    search = BisectSearch(fires_alone(triggered))
+    assert sorted(search.run(list(range(128)))) == [[addr] for addr in sorted(triggered)]
+
+
+def test_rounds_grow_with_the_log_of_the_candidates():
+    search = BisectSearch(fires_alone({1000}))
+    search.run(list(range(4096)))
+    # both halves of every level
+    assert len(search.rounds) == 2 * 12
+    assert [armed for armed, _, _ in search.rounds[::2]] == [4096 >> level for level in range(1, 13)]
+
+
+def test_functions_firing_only_together_fall_back_to_ddmin():
+    # 5 and 12 fire only when both are armed, 20 on its own
+    def run_round(group):
+        hits = {20} & set(group)
+        if {5, 12} <= set(group):
+            hits |= {5, 12}
+        return hits
+
+    search = BisectSearch(run_round)
+    assert sorted(search.run(list(range(32)))) == [[5, 12], [20]]
+
+
+def test_max_rounds_returns_the_unsplit_groups():
+    search = BisectSearch(fires_alone({3}), max_rounds=2)
+    groups = search.run(list(range(16)))
+    assert len(search.rounds) == 2
+    assert groups == [list(range(8))]
+    # the candidates in play when each round ran
+    assert [candidates for _, _, candidates in search.rounds] == [16, 16]
+
+
+def test_quiet_groups_are_not_rerun():
+    rounds = []
+    def run_round(group):
+        rounds.append(tuple(group))
+        return set(group) if {1, 2} <= set(group) else set()
+
+    BisectSearch(run_round).run([0, 1, 2])
+    assert len(rounds) == len(set(rounds))
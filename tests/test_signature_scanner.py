@@ -0,0 +1,36 @@
+from signature_scanner import SignatureScanner
+
+PROLOGUE = bytes([0x55, 0x48, 0x89, 0xe5])
+ENDBR_PROLOGUE = bytes([0xf3, 0x0f, 0x1e, 0xfa]) + PROLOGUE
+
+
+def test_finds_every_signature_in_offset_order():
+    mem = b"\x90" * 3 + PROLOGUE + b"\xcc" * 5 + ENDBR_PROLOGUE + b"\x90"
+    scanner = SignatureScanner([PROLOGUE, ENDBR_PROLOGUE])
+    assert list(scanner.iter_candidates(mem)) == [(3, PROLOGUE), (12, ENDBR_PROLOGUE)]
+
+
+def test_nested_hit_is_reported_once():
+    # the push after the endbr64 is part of the longer hit
+    scanner = SignatureScanner([PROLOGUE, ENDBR_PROLOGUE])
+    assert list(scanner.iter_candidates(ENDBR_PROLOGUE)) == [(0, ENDBR_PROLOGUE)]
+
+
+def test_window_bounds_the_hit_start_not_its_end():
+    mem = b"\x90" * 6 + PROLOGUE
+    scanner = SignatureScanner([PROLOGUE])
+    assert list(scanner.iter_candidates(mem, 0, 7)) == [(6, PROLOGUE)]
+    assert list(scanner.iter_candidates(mem, 0, 6)) == []
+
+
+def test_buffers_without_find_take_the_regex_path():
+    mem = b"\x00" + PROLOGUE + b"\x00" + ENDBR_PROLOGUE
+    scanner = SignatureScanner([PROLOGUE, ENDBR_PROLOGUE])
+    assert list(scanner.iter_candidates(memoryview(mem))) == list(scanner.iter_candidates(mem))
+
+
+def test_scan_confirms_and_relocates():
+    mem = PROLOGUE + b"\x90" * 4 + PROLOGUE
+    scanner = SignatureScanner([PROLOGUE])
+    assert scanner.scan(mem, 0x1000) == [0x1000, 0x1008]
+    assert scanner.scan(mem, 0x1000, confirm=lambda offset, signature: offset > 0) == [0x1008]
@@ -0,0 +1,85 @@
+import itertools
+
+import pytest
+
+import trace_log
+from trace_analyzer import Symbols, build_call_trees
+from trace_log import EVENT_ENTRY, EVENT_RETURN, TraceLogWriter, TraceRecord, read_trace
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing timestamps, consecutive appends may read the same ns otherwise."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(trace_log.time, "monotonic_ns", lambda: next(ticks))
+
+
+def write_log(path, capacity: int, pcs: list[int]) -> None:
+    writer = TraceLogWriter(str(path), capacity)
+    for pc in pcs:
+        writer.append(7, pc, EVENT_ENTRY)
+    writer.close()
+
+
+def test_read_back_in_order(tmp_path, clock):
+    path = tmp_path / "trace.bin"
+    write_log(path, 8, [0x10, 0x20, 0x30])
+    assert [(record.thread, record.pc, record.event) for record in read_trace(str(path))] == \
+        [(7, 0x10, EVENT_ENTRY), (7, 0x20, EVENT_ENTRY), (7, 0x30, EVENT_ENTRY)]
+
+
+def test_ring_keeps_the_newest_records_oldest_first(tmp_path, clock):
+    path = tmp_path / "trace.bin"
+    write_log(path, 4, [0x10 * index for index in range(1, 7)])
+    assert [record.pc for record in read_trace(str(path))] == [0x30, 0x40, 0x50, 0x60]
+
+
+def test_unflushed_log_reads_the_same(tmp_path, clock):
+    path = tmp_path / "trace.bin"
+    writer = TraceLogWriter(str(path), 4)
+    for pc in (0x10, 0x20, 0x30, 0x40, 0x50):
+        writer.append(7, pc, EVENT_ENTRY)
+    # the header still says 0 records, as after a crash
+    assert [record.pc for record in read_trace(str(path))] == [0x20, 0x30, 0x40, 0x50]
+    writer.close()
+
+
+@pytest.mark.parametrize("capacity", [0, -1])
+def test_rejects_an_empty_ring(tmp_path, capacity):
+    with pytest.raises(ValueError):
+        TraceLogWriter(str(tmp_path / "trace.bin"), capacity)
+    assert not (tmp_path / "trace.bin").exists()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError):
+        list(read_trace(str(path)))
+
+
+def test_call_trees_nest_entries_until_their_return():
+    events = [
+        (1, 0x100, EVENT_ENTRY),
+        (1, 0x200, EVENT_ENTRY),
+        (1, 0x300, EVENT_ENTRY),
+        (1, 0x300, EVENT_RETURN),
+        (1, 0x300, EVENT_ENTRY),
+        # returns past the missing return of 0x300
+        (1, 0x200, EVENT_RETURN),
+        (1, 0x400, EVENT_ENTRY),
+        (2, 0x200, EVENT_ENTRY),
+        (1, 0x400, EVENT_RETURN),
+        (1, 0x100, EVENT_RETURN),
+        (1, 0x100, EVENT_ENTRY),
+    ]
+    records = [TraceRecord(timestamp, thread, pc, event) for timestamp, (thread, pc, event) in enumerate(events, 1)]
+    trees = build_call_trees(records, Symbols())
+
+    assert sorted(trees) == [1, 2]
+    main = trees[1][0x100]
+    assert main.calls == 2
+    assert [(child.addr, child.calls) for child in main.children.values()] == [(0x200, 1), (0x400, 1)]
+    assert main.child("0x200", 0x200).child("0x300", 0x300).calls == 2
+    # another thread's stack is its own
+    assert list(trees[2]) == [0x200]